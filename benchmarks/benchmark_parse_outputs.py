@@ -0,0 +1,97 @@
+"""Benchmark comparing the single-pass tag extraction of parse_outputs with the previous BeautifulSoup path.
+
+Requires bs4 for the reference path. Run from the repository root:
+    python -m benchmarks.benchmark_parse_outputs --num-outputs 2000
+"""
+
+import argparse
+import random
+import time
+
+import bs4
+
+from helper_methods.parse_outputs import (parse_html_output, parse_html_output_with_multiple_tags_batch,
+                                          parse_html_outputs_batch)
+
+WORDS = ["retrieval", "augmented", "generation", "mentor", "student", "embedding", "token", "chunk",
+         "document", "question", "answer", "context", "the", "of", "and", "a", "to", "in", "is", "that",
+         "x < y", "&amp;", "a & b", "<br>"]
+FIELDS = ["text", "options", "answer", "explanation"]
+
+
+def make_outputs(num_outputs: int, min_sections: int = 1, max_sections: int = 10, seed: int = 0) -> list[str]:
+    """Generate LLM-style outputs with <thinking> and repeated <question> sections."""
+    rng = random.Random(seed)
+
+    def words(max_words: int) -> str:
+        return " ".join(rng.choices(WORDS, k=rng.randint(1, max_words)))
+
+    outputs = []
+    for _ in range(num_outputs):
+        sections = [f"<thinking>\n{words(200)}\n</thinking>"]
+        for _ in range(rng.randint(min_sections, max_sections)):
+            fields = "\n".join(f"  <{field}>{words(40)}</{field}>" for field in FIELDS)
+            sections.append(f"<question>\n{fields}\n</question>")
+        outputs.append("Here are the questions.\n" + "\n".join(sections))
+    return outputs
+
+
+def bs4_parse_html_output(html_output: str, tag_to_extract: str) -> str:
+    soup = bs4.BeautifulSoup(html_output, 'html.parser')
+    return soup.find(tag_to_extract).text.strip()
+
+
+def bs4_parse_html_outputs(html_output: str, tag_to_extract: str) -> list[str]:
+    soup = bs4.BeautifulSoup(html_output, 'html.parser')
+    return [tag.text.strip() for tag in soup.find_all(tag_to_extract)]
+
+
+def bs4_parse_html_output_with_multiple_tags(html_output: str,
+                                            main_tag: str,
+                                            list_of_tags_to_extract: list[str]) -> list[dict[str, str]]:
+    soup = bs4.BeautifulSoup(html_output, 'html.parser')
+    list_of_dicts = []
+    for main_instance in soup.find_all(main_tag):
+        dict_to_add = {}
+        for tag in list_of_tags_to_extract:
+            dict_to_add[tag] = main_instance.find(tag).text.strip() if main_instance.find(tag) else ""
+        list_of_dicts.append(dict_to_add)
+    return list_of_dicts
+
+
+def time_call(fn, *args, **kwargs) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-outputs", type=int, default=2000)
+    parser.add_argument("--max-sections", type=int, default=10)
+    args = parser.parse_args()
+
+    outputs = make_outputs(args.num_outputs, max_sections=args.max_sections)
+    benchmarks = [
+        ("parse_html_output",
+         lambda: [bs4_parse_html_output(output, "thinking") for output in outputs],
+         lambda: [parse_html_output(output, "thinking") for output in outputs]),
+        ("parse_html_outputs",
+         lambda: [bs4_parse_html_outputs(output, "answer") for output in outputs],
+         lambda: parse_html_outputs_batch(outputs, "answer")),
+        ("parse_html_output_with_multiple_tags",
+         lambda: [bs4_parse_html_output_with_multiple_tags(output, "question", FIELDS) for output in outputs],
+         lambda: parse_html_output_with_multiple_tags_batch(outputs, "question", FIELDS)),
+    ]
+
+    print(f"outputs: {len(outputs)}, total characters: {sum(map(len, outputs))}")
+    for name, reference, candidate in benchmarks:
+        reference_time, expected = time_call(reference)
+        candidate_time, result = time_call(candidate)
+        assert result == expected, f"{name} differs from the BeautifulSoup results"
+        print(f"{name}: bs4 {reference_time:.3f}s, single-pass {candidate_time:.3f}s "
+              f"({reference_time / candidate_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
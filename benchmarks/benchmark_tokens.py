@@ -0,0 +1,59 @@
+"""Benchmark comparing per-string token counting with the batched and memoized paths.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_tokens --num-texts 20000
+"""
+
+import argparse
+import random
+import time
+
+from helper_methods.tokens import (DEFAULT_ENCODING_NAME, TokenCounter, count_tokens_batch,
+                                   num_tokens_from_string)
+
+WORDS = ["retrieval", "augmented", "generation", "mentor", "student", "embedding", "token", "chunk",
+         "document", "question", "answer", "context", "the", "of", "and", "a", "to", "in", "is", "that"]
+
+
+def make_texts(num_texts: int, min_words: int = 20, max_words: int = 400, seed: int = 0) -> list[str]:
+    """Generate random texts of mixed length."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(min_words, max_words))) for _ in range(num_texts)]
+
+
+def time_call(fn, *args, **kwargs) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-texts", type=int, default=20000)
+    parser.add_argument("--num-threads", type=int, default=8)
+    parser.add_argument("--encoding-name", default=DEFAULT_ENCODING_NAME)
+    args = parser.parse_args()
+
+    texts = make_texts(args.num_texts)
+
+    per_string_time, per_string = time_call(
+        lambda: [num_tokens_from_string(text, encoding_name=args.encoding_name) for text in texts])
+    batch_time, batch = time_call(count_tokens_batch, texts, encoding_name=args.encoding_name,
+                                  num_threads=args.num_threads)
+    assert per_string == batch
+
+    counter = TokenCounter(encoding_name=args.encoding_name, num_threads=args.num_threads)
+    cold_time, _ = time_call(counter.count_tokens_batch, texts)
+    warm_time, warm = time_call(counter.count_tokens_batch, texts)
+    assert warm == batch
+
+    print(f"texts: {len(texts)}, total tokens: {sum(batch)}")
+    print(f"per-string num_tokens_from_string: {per_string_time:.3f}s")
+    print(f"count_tokens_batch ({args.num_threads} threads): {batch_time:.3f}s "
+          f"({per_string_time / batch_time:.1f}x)")
+    print(f"TokenCounter cold: {cold_time:.3f}s, warm: {warm_time:.3f}s "
+          f"({per_string_time / warm_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,430 @@
-import bs4
+import functools
+import html.entities
+import itertools
 import logging
+import re
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tag extraction gives the results of bs4.BeautifulSoup(html_output, 'html.parser') without building a tree. The
+# tokenizer follows html.parser (with convert_charrefs=False, as bs4 uses it) and the bookkeeping follows the bs4 tree
+# builder: tag names are lowercased, an end tag closes the innermost open element of its name together with the
+# elements opened inside it, elements still open at the end of the output are closed there, whitespace-only strings
+# outside <pre> and <textarea> collapse to a single space or newline, and the text of an element joins the strings of
+# its descendants, leaving out comments, declarations and the strings of script, style, template, rt and rp elements.
+
+_INTERESTING_PATTERN = re.compile(r"[&<]")
+_START_TAG_OPEN_PATTERN = re.compile(r"<[a-zA-Z]")
+# Start tags without attributes, which need none of the checks of _parse_start_tag.
+_SIMPLE_START_TAG_PATTERN = re.compile(r"<([a-zA-Z][^\t\n\r\f />\x00]*)>")
+_TAG_FIND_PATTERN = re.compile(r"([a-zA-Z][^\t\n\r\f />\x00]*)(?:\s|/(?!>))*")
+_ATTRIBUTE_FIND_PATTERN = re.compile(
+    r"((?<=[\'\"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*(\'[^\']*\'|\"[^\"]*\"|(?![\'\"])[^>\s]*))?(?:\s|/(?!>))*")
+_START_TAG_END_PATTERN = re.compile(r"""
+  <[a-zA-Z][^\t\n\r\f />\x00]*
+  (?:[\s/]*
+    (?:(?<=['"\s/])[^\s/>][^\s/=>]*
+      (?:\s*=+\s*
+        (?:'[^']*'
+          |"[^"]*"
+          |(?!['"])[^>\s]*
+         )
+        \s*
+       )?(?:\s|/(?!>))*
+     )*
+   )?
+  \s*
+""", re.VERBOSE)
+_END_TAG_FIND_PATTERN = re.compile(r"</\s*([a-zA-Z][-.a-zA-Z0-9:_]*)\s*>")
+_CHARACTER_REFERENCE_PATTERN = re.compile(r"&#(?:[0-9]+|[xX][0-9a-fA-F]+)[^0-9a-fA-F]")
+_ENTITY_REFERENCE_PATTERN = re.compile(r"&([a-zA-Z][-.a-zA-Z0-9]*)[^a-zA-Z0-9]")
+_INCOMPLETE_REFERENCE_PATTERN = re.compile(r"&[a-zA-Z#]")
+_ENTITY_NAME_PATTERN = re.compile(r"&[a-zA-Z][-.a-zA-Z0-9]*")
+_COMMENT_CLOSE_PATTERN = re.compile(r"--\s*>")
+_DECLARATION_NAME_PATTERN = re.compile(r"[a-zA-Z][-_.a-zA-Z0-9]*\s*")
+_MARKED_SECTION_CLOSE_PATTERN = re.compile(r"]\s*]\s*>")
+_MS_MARKED_SECTION_CLOSE_PATTERN = re.compile(r"]\s*>")
+
+_VOID_ELEMENTS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem",
+                            "meta", "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame",
+                            "image", "isindex", "nextid", "spacer"})
+_RAW_TEXT_ELEMENTS = frozenset({"script", "style"})
+# Elements whose strings only count for the text of elements of the same name.
+_STRING_CONTAINER_ELEMENTS = frozenset({"rt", "rp", "style", "script", "template"})
+_PRESERVE_WHITESPACE_ELEMENTS = frozenset({"pre", "textarea"})
+_ASCII_SPACES = " \n\t\x0c\r"
+_CDATA = "cdata"
+
+
+@functools.lru_cache(maxsize=1)
+def _named_entities() -> dict[str, str]:
+    entities = {}
+    for name, character in sorted(html.entities.html5.items()):
+        entities.setdefault(name[:-1] if name.endswith(";") else name, character)
+    return entities
+
+
+def _resolve_numeric_reference(name: str) -> str:
+    codepoint = int(name[1:], 16) if name[:1] in "xX" else int(name)
+    if codepoint == 0 or codepoint > 0x10FFFF or 0xD800 <= codepoint <= 0xDFFF:
+        return "\ufffd"
+    if 0x80 <= codepoint <= 0x9F:
+        try:
+            return bytes([codepoint]).decode("windows-1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(codepoint)
+
+
+class _TagScanner:
+    """Single-pass scanner recording the elements with the given names and the strings they contain.
+
+    Elements are lists [name, first string, end string, start sequence number, end sequence number] whose end values
+    are None while the element is open. An element is a descendant of another one if its start sequence number lies in
+    (start, end] of the other one. Only the strings inside recorded elements are kept; strings of string containers
+    and CDATA sections are kept as (kind, string) tuples.
+
+    Raises:
+        ValueError: On markup rejected by html.parser.
+    """
+
+    def __init__(self, names, on_close=None, stop_after_first: bool = False):
+        self.names = frozenset(names)
+        self.elements = []
+        self.strings = []
+        self.on_close = on_close
+        # Stop scanning once the first recorded element is closed.
+        self.stop_after_first = stop_after_first
+        self.stopped = False
+        self._buffer = ""
+        self._data = []
+        self._stack = []
+        self._num_recorded_open = 0
+        self._sequence = 0
+        self._raw_text_element = None
+        self._raw_text_end = None
+        self._containers = []
+        self._num_preserving_whitespace = 0
+        # Void elements opened without a /> whose end tags are ignored, by name.
+        self._already_closed_void_elements = {}
+        self._has_special_strings = False
+
+    def text_of(self, element) -> str:
+        strings = self.strings[element[1]:element[2]]
+        if not self._has_special_strings:
+            return "".join(strings)
+        if element[0] in _STRING_CONTAINER_ELEMENTS:
+            return "".join(string[1] for string in strings if string.__class__ is tuple and string[0] == element[0])
+        return "".join(string if string.__class__ is str else string[1] for string in strings
+                       if string.__class__ is str or string[0] == _CDATA)
+
+    def _end_data(self, kind: str | None = None) -> None:
+        if not self._data:
+            return
+        if not self._num_recorded_open:
+            self._data = []
+            return
+        string = "".join(self._data)
+        self._data = []
+        if not self._num_preserving_whitespace and not string.strip(_ASCII_SPACES):
+            string = "\n" if "\n" in string else " "
+        if kind is None and self._containers:
+            kind = self._containers[-1]
+        if kind is not None:
+            self._has_special_strings = True
+            self.strings.append((kind, string))
+        else:
+            self.strings.append(string)
+
+    def _skip(self) -> None:
+        # Comments, declarations and processing instructions end the current string and are not part of any text.
+        self._end_data()
+
+    def _push(self, name: str) -> None:
+        self._end_data()
+        self._sequence += 1
+        element = None
+        if name in self.names:
+            element = [name, len(self.strings), None, self._sequence, None]
+            self.elements.append(element)
+            self._num_recorded_open += 1
+        self._stack.append((name, element))
+        if name in _STRING_CONTAINER_ELEMENTS:
+            self._containers.append(name)
+        if name in _PRESERVE_WHITESPACE_ELEMENTS:
+            self._num_preserving_whitespace += 1
+
+    def _pop(self) -> None:
+        name, element = self._stack.pop()
+        if name in _STRING_CONTAINER_ELEMENTS:
+            self._containers.pop()
+        if name in _PRESERVE_WHITESPACE_ELEMENTS:
+            self._num_preserving_whitespace -= 1
+        if element is not None:
+            element[2] = len(self.strings)
+            element[4] = self._sequence
+            self._num_recorded_open -= 1
+            if self.on_close is not None:
+                self.on_close(element)
+            if self.stop_after_first and element is self.elements[0]:
+                self.stopped = True
+
+    def _pop_to(self, name: str) -> None:
+        self._end_data()
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == name:
+                for _ in range(len(self._stack) - depth):
+                    self._pop()
+                return
+
+    def _start_tag(self, name: str, self_closing: bool) -> None:
+        if (self_closing or name in _VOID_ELEMENTS) and name not in self.names:
+            # An empty element which is not recorded only ends the current string.
+            self._end_data()
+            self._sequence += 1
+        else:
+            self._push(name)
+            if self_closing or name in _VOID_ELEMENTS:
+                self._pop_to(name)
+        if self_closing:
+            return
+        if name in _VOID_ELEMENTS:
+            self._already_closed_void_elements[name] = self._already_closed_void_elements.get(name, 0) + 1
+        elif name in _RAW_TEXT_ELEMENTS:
+            self._raw_text_element = name
+            self._raw_text_end = re.compile(rf"</\s*{name}\s*>", re.I)
+
+    def _end_tag(self, name: str) -> None:
+        if self._already_closed_void_elements.get(name):
+            self._already_closed_void_elements[name] -= 1
+        else:
+            self._pop_to(name)
+
+    def _parse_start_tag(self, buffer: str, i: int) -> int:
+        match = _START_TAG_END_PATTERN.match(buffer, i)
+        j = match.end()
+        next_character = buffer[j:j + 1]
+        if next_character == ">":
+            end = j + 1
+        elif next_character == "/":
+            if not buffer.startswith("/>", j):
+                return -1
+            end = j + 2
+        elif next_character == "" or next_character in "=/" or next_character.isascii() and next_character.isalpha():
+            return -1
+        else:
+            end = j if j > i else i + 1
+
+        match = _TAG_FIND_PATTERN.match(buffer, i + 1)
+        k = match.end()
+        name = match.group(1).lower()
+        while k < end:
+            attribute = _ATTRIBUTE_FIND_PATTERN.match(buffer, k)
+            if not attribute:
+                break
+            k = attribute.end()
+        rest = buffer[k:end].strip()
+        if rest == ">":
+            self._start_tag(name, False)
+        elif rest == "/>":
+            self._start_tag(name, True)
+        else:
+            self._data.append(buffer[i:end])
+        return end
+
+    def _parse_end_tag(self, buffer: str, i: int) -> int:
+        greater_than = buffer.find(">", i + 1)
+        if greater_than == -1:
+            return -1
+        match = _END_TAG_FIND_PATTERN.match(buffer, i)
+        if match:
+            name = match.group(1).lower()
+            if self._raw_text_element is not None:
+                if name != self._raw_text_element:
+                    self._data.append(buffer[i:greater_than + 1])
+                    return greater_than + 1
+                self._raw_text_element = self._raw_text_end = None
+            self._end_tag(name)
+            return greater_than + 1
+        if self._raw_text_element is not None:
+            self._data.append(buffer[i:greater_than + 1])
+            return greater_than + 1
+        match = _TAG_FIND_PATTERN.match(buffer, i + 2)
+        if not match:
+            if buffer.startswith("</>", i):
+                return i + 3
+            self._skip()
+            return greater_than + 1
+        self._end_tag(match.group(1).lower())
+        return buffer.find(">", match.end()) + 1
+
+    def _parse_declaration(self, buffer: str, i: int) -> int:
+        if buffer.startswith("<![", i):
+            match = _DECLARATION_NAME_PATTERN.match(buffer, i + 3)
+            if i + 3 == len(buffer) or match and match.end() == len(buffer):
+                return -1
+            if not match:
+                raise ValueError(f"expected name token at {buffer[i:i + 20]!r}")
+            section = match.group().strip().lower()
+            if section in ("temp", "cdata", "ignore", "include", "rcdata"):
+                close = _MARKED_SECTION_CLOSE_PATTERN.search(buffer, i + 3)
+            elif section in ("if", "else", "endif"):
+                close = _MS_MARKED_SECTION_CLOSE_PATTERN.search(buffer, i + 3)
+            else:
+                raise ValueError(f"unknown status keyword {section!r} in marked section")
+            if not close:
+                return -1
+            content = buffer[i + 3:close.start()]
+            self._end_data()
+            if content.upper().startswith("CDATA["):
+                self._data.append(content[6:])
+                self._end_data(_CDATA)
+            return close.end()
+        if buffer[i:i + 9].lower() == "<!doctype":
+            greater_than = buffer.find(">", i + 9)
+        else:
+            greater_than = buffer.find(">", i + 2)
+        if greater_than == -1:
+            return -1
+        self._skip()
+        return greater_than + 1
+
+    def feed(self, data: str, final: bool = False) -> None:
+        """Scan a chunk of output. Markup which may continue in the next chunk is kept until then."""
+        buffer = self._buffer + data
+        n = len(buffer)
+        i = 0
+        while i < n and not self.stopped:
+            if self._raw_text_end is None:
+                match = _INTERESTING_PATTERN.search(buffer, i)
+                j = match.start() if match else n
+            else:
+                match = self._raw_text_end.search(buffer, i)
+                if not match:
+                    break
+                j = match.start()
+            if i < j:
+                self._data.append(buffer[i:j])
+            i = j
+            if i == n:
+                break
+
+            if buffer[i] == "<":
+                match = _SIMPLE_START_TAG_PATTERN.match(buffer, i)
+                if match:
+                    self._start_tag(match.group(1).lower(), False)
+                    k = match.end()
+                elif _START_TAG_OPEN_PATTERN.match(buffer, i):
+                    k = self._parse_start_tag(buffer, i)
+                elif buffer.startswith("</", i):
+                    k = self._parse_end_tag(buffer, i)
+                elif buffer.startswith("<!--", i):
+                    match = _COMMENT_CLOSE_PATTERN.search(buffer, i + 4)
+                    k = -1 if not match else match.end()
+                    if match:
+                        self._skip()
+                elif buffer.startswith("<?", i):
+                    k = buffer.find(">", i + 2)
+                    if k != -1:
+                        self._skip()
+                        k += 1
+                elif buffer.startswith("<!", i):
+                    k = self._parse_declaration(buffer, i)
+                elif i + 1 < n:
+                    self._data.append("<")
+                    k = i + 1
+                else:
+                    break
+                if k < 0:
+                    if not final:
+                        break
+                    k = buffer.find(">", i + 1)
+                    if k < 0:
+                        k = buffer.find("<", i + 1)
+                        if k < 0:
+                            k = i + 1
+                    else:
+                        k += 1
+                    self._data.append(buffer[i:k])
+                i = k
+            elif buffer.startswith("&#", i):
+                match = _CHARACTER_REFERENCE_PATTERN.match(buffer, i)
+                if match:
+                    self._data.append(_resolve_numeric_reference(match.group()[2:-1]))
+                    i = match.end() if match.group().endswith(";") else match.end() - 1
+                    continue
+                if ";" in buffer[i:]:
+                    self._data.append("&#")
+                    i += 2
+                break
+            else:
+                match = _ENTITY_REFERENCE_PATTERN.match(buffer, i)
+                if match and not final and _ENTITY_NAME_PATTERN.match(buffer, i).end() == n:
+                    # The name may continue in the next chunk.
+                    break
+                if match:
+                    name = match.group(1)
+                    self._data.append(_named_entities().get(name, f"&{name}"))
+                    i = match.end() if match.group().endswith(";") else match.end() - 1
+                    continue
+                match = _INCOMPLETE_REFERENCE_PATTERN.match(buffer, i)
+                if match:
+                    if final and match.group() == buffer[i:]:
+                        i += 1
+                    break
+                if i + 1 < n:
+                    self._data.append("&")
+                    i += 1
+                else:
+                    break
+        if final and i < n and self._raw_text_element is None and not self.stopped:
+            self._data.append(buffer[i:n])
+            i = n
+        self._buffer = buffer[i:]
+
+    def close(self) -> None:
+        """Scan the rest of the output and close the elements which are still open."""
+        self.feed("", final=True)
+        self._end_data()
+        while self._stack and not self.stopped:
+            self._pop()
+
+    def discard_closed(self) -> None:
+        """Forget the recorded elements and their strings while none of them is open, bounding the memory of a
+        stream."""
+        if not self._num_recorded_open:
+            self.elements.clear()
+            self.strings.clear()
+
+
+def _scan(html_output: str, names, stop_after_first: bool = False) -> _TagScanner:
+    # html.parser rejects some marked sections (<![...), failing the whole parse, so such outputs are scanned to the end.
+    scanner = _TagScanner(names, stop_after_first=stop_after_first and "<![" not in html_output)
+    scanner.feed(html_output)
+    scanner.close()
+    return scanner
+
+
+def _main_tag_record(scanner: _TagScanner, main_instance, following_elements,
+                     list_of_tags_to_extract: list[str]) -> dict[str, str]:
+    # The first descendant of every tag; descendants follow the main element in start order.
+    found = {}
+    for descendant in following_elements:
+        if descendant[3] > main_instance[4]:
+            break
+        found.setdefault(descendant[0], descendant)
+    return {tag: scanner.text_of(found[tag]).strip() if tag in found else "" for tag in list_of_tags_to_extract}
+
+
+def _group_by_main_tag(scanner: _TagScanner, main_tag: str, list_of_tags_to_extract: list[str]) -> list[dict[str, str]]:
+    elements = scanner.elements
+    return [_main_tag_record(scanner, main_instance, itertools.islice(elements, index + 1, None),
+                             list_of_tags_to_extract)
+            for index, main_instance in enumerate(elements) if main_instance[0] == main_tag]
+
+
 def parse_html_output(html_output: str, tag_to_extract: str) -> str:
     """Parse the HTML output and return the text.
 
@@ -14,9 +435,10 @@ def parse_html_output(html_output: str, tag_to_extract: str) -> str:
         str: The text.
     """
     try:
-        soup = bs4.BeautifulSoup(html_output, 'html.parser')
-        tag = soup.find(tag_to_extract)
-        return tag.text.strip()
+        scanner = _scan(html_output, {tag_to_extract}, stop_after_first=True)
+        if not scanner.elements:
+            raise ValueError(f"No {tag_to_extract} tag found")
+        return scanner.text_of(scanner.elements[0]).strip()
     except Exception as e:
         logger.error(f"Error parsing HTML output: {e}. Could not parse {tag_to_extract} from {html_output}.")
         return html_output
@@ -36,14 +458,8 @@ def parse_html_output_with_multiple_tags(html_output: str,
         list[dict[str, str]]: A list of dictionaries with the tag as the key and the text as the value.
     """
     try:
-        soup = bs4.BeautifulSoup(html_output, 'html.parser')
-        list_of_dicts = []
-        for main_instance in soup.find_all(main_tag):
-            dict_to_add = {}
-            for tag in list_of_tags_to_extract:
-                dict_to_add[tag] = main_instance.find(tag).text.strip() if main_instance.find(tag) else ""
-            list_of_dicts.append(dict_to_add)
-        return list_of_dicts
+        scanner = _scan(html_output, {main_tag, *list_of_tags_to_extract})
+        return _group_by_main_tag(scanner, main_tag, list_of_tags_to_extract)
     except Exception as e:
         logger.error(f"Error parsing HTML output: {e}.")
         return []
@@ -58,12 +474,158 @@ def parse_html_outputs(html_output: str, tag_to_extract: str) -> list[str]:
         list[str]: The list of texts.
     """
     try:
-        soup = bs4.BeautifulSoup(html_output, 'html.parser')
-        list_of_texts = []
-        for tag in soup.find_all(tag_to_extract):
-            list_of_texts.append(tag.text.strip())
-        return list_of_texts
+        scanner = _scan(html_output, {tag_to_extract})
+        return [scanner.text_of(element).strip() for element in scanner.elements]
     except Exception as e:
         logger.error(f"Error parsing HTML output: {e}.")
         return []
     
+
+
+def parse_html_outputs_batch(html_outputs: list[str], tag_to_extract: str) -> list[list[str]]:
+    """Parse many HTML outputs and return the list of texts of each, like parse_html_outputs.
+
+    Args:
+        html_outputs (list[str]): The HTML outputs.
+        tag_to_extract (str): The tag to extract.
+    Returns:
+        list[list[str]]: The list of texts of every output, in input order.
+    """
+    return [parse_html_outputs(html_output, tag_to_extract) for html_output in html_outputs]
+
+
+def parse_html_output_with_multiple_tags_batch(html_outputs: list[str],
+                                               main_tag: str,
+                                               list_of_tags_to_extract: list[str]) -> list[list[dict[str, str]]]:
+    """Parse many HTML outputs with multiple tags, like parse_html_output_with_multiple_tags.
+
+    Args:
+        html_outputs (list[str]): The HTML outputs.
+        main_tag (str): The main tag to extract.
+        list_of_tags_to_extract (list[str]): The list of tags to extract.
+    Returns:
+        list[list[dict[str, str]]]: The list of dictionaries of every output, in input order.
+    """
+    return [parse_html_output_with_multiple_tags(html_output, main_tag, list_of_tags_to_extract)
+            for html_output in html_outputs]
+
+
+class IncrementalTagParser:
+    """Parser of an output arriving in chunks, e.g. the text deltas of a ResponseStream, which returns every tagged
+    section as soon as its closing tag is seen.
+
+    With tags_to_extract, the records are (tag, text) tuples, as parse_html_outputs would return them for each tag.
+    With main_tag and list_of_tags_to_extract, the records are dictionaries, as parse_html_output_with_multiple_tags
+    would return them. Records come in the order in which their elements close, so a nested element comes before the
+    element containing it. Elements left open at the end of the output are returned by close.
+    """
+
+    def __init__(self,
+                 tags_to_extract: list[str] = None,
+                 main_tag: str = None,
+                 list_of_tags_to_extract: list[str] = None):
+        """
+        Args:
+            tags_to_extract (list[str], optional): The tags whose texts are returned.
+            main_tag (str, optional): The main tag, whose records are returned.
+            list_of_tags_to_extract (list[str], optional): The tags to extract within every main tag.
+        Raises:
+            ValueError: If neither tags_to_extract nor main_tag and list_of_tags_to_extract are given.
+        """
+        if tags_to_extract is not None:
+            names = set(tags_to_extract)
+        elif main_tag is not None and list_of_tags_to_extract is not None:
+            names = {main_tag, *list_of_tags_to_extract}
+        else:
+            raise ValueError("Either tags_to_extract or main_tag and list_of_tags_to_extract are required.")
+        self.tags_to_extract = tags_to_extract
+        self.main_tag = main_tag
+        self.list_of_tags_to_extract = list_of_tags_to_extract
+        self._scanner = _TagScanner(names, on_close=self._on_close)
+        self._records = []
+        self._failed = False
+
+    def _on_close(self, element) -> None:
+        if self.tags_to_extract is not None:
+            self._records.append((element[0], self._scanner.text_of(element).strip()))
+        elif element[0] == self.main_tag:
+            elements = self._scanner.elements
+            index = next(index for index in range(len(elements) - 1, -1, -1) if elements[index] is element)
+            self._records.append(_main_tag_record(self._scanner, element, itertools.islice(elements, index + 1, None),
+                                                  self.list_of_tags_to_extract))
+
+    def _parse(self, scan) -> list:
+        if self._failed:
+            return []
+        try:
+            scan()
+        except Exception as e:
+            logger.error(f"Error parsing HTML output: {e}.")
+            self._failed = True
+        self._scanner.discard_closed()
+        records, self._records = self._records, []
+        return records
+
+    def feed(self, chunk: str) -> list:
+        """Parse the next chunk of the output.
+
+        Args:
+            chunk (str): The chunk.
+        Returns:
+            list: The records of the elements closed in the chunk.
+        """
+        return self._parse(lambda: self._scanner.feed(chunk))
+
+    def close(self) -> list:
+        """Parse the end of the output.
+
+        Returns:
+            list: The records of the elements closed at the end of the output.
+        """
+        return self._parse(self._scanner.close)
+
+
+def parse_html_output_stream(chunks: Iterable[str],
+                             tags_to_extract: list[str] = None,
+                             main_tag: str = None,
+                             list_of_tags_to_extract: list[str] = None) -> Iterator:
+    """Parse an output arriving in chunks, yielding the records of IncrementalTagParser as soon as they are complete.
+
+    Args:
+        chunks (Iterable[str]): The chunks of the output, e.g. a ResponseStream.
+        tags_to_extract (list[str], optional): The tags whose (tag, text) records are yielded.
+        main_tag (str, optional): The main tag, whose records are yielded.
+        list_of_tags_to_extract (list[str], optional): The tags to extract within every main tag.
+    Returns:
+        Iterator: The records.
+    Raises:
+        ValueError: If neither tags_to_extract nor main_tag and list_of_tags_to_extract are given.
+    """
+    parser = IncrementalTagParser(tags_to_extract, main_tag, list_of_tags_to_extract)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+async def parse_html_output_stream_async(chunks: AsyncIterable[str],
+                                         tags_to_extract: list[str] = None,
+                                         main_tag: str = None,
+                                         list_of_tags_to_extract: list[str] = None) -> AsyncIterator:
+    """Async version of parse_html_output_stream, e.g. for an AsyncResponseStream.
+
+    Args:
+        chunks (AsyncIterable[str]): The chunks of the output.
+        tags_to_extract (list[str], optional): The tags whose (tag, text) records are yielded.
+        main_tag (str, optional): The main tag, whose records are yielded.
+        list_of_tags_to_extract (list[str], optional): The tags to extract within every main tag.
+    Returns:
+        AsyncIterator: The records.
+    Raises:
+        ValueError: If neither tags_to_extract nor main_tag and list_of_tags_to_extract are given.
+    """
+    parser = IncrementalTagParser(tags_to_extract, main_tag, list_of_tags_to_extract)
+    async for chunk in chunks:
+        for record in parser.feed(chunk):
+            yield record
+    for record in parser.close():
+        yield record
@@ -1,5 +1,91 @@
 import numpy as np
 
+
 def cosine_similarity(embedding1: list[float], embedding2: list[float]) -> float:
     """Calculate the cosine similarity between two embeddings."""
     return np.dot(embedding1, embedding2) / (np.linalg.norm(embedding1) * np.linalg.norm(embedding2))
+
+
+def normalize_embeddings(embeddings, dtype=np.float32) -> np.ndarray:
+    """L2-normalize embeddings so that cosine similarity becomes a dot product.
+
+    Args:
+        embeddings: A single embedding of shape (dim,) or a matrix of shape (n, dim).
+        dtype (optional): The dtype of the result. Defaults to np.float32.
+    Returns:
+        np.ndarray: The normalized embeddings. Rows with zero norm are left as zeros.
+    """
+    embeddings = np.asarray(embeddings, dtype=dtype)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    np.maximum(norms, np.finfo(dtype).tiny, out=norms)
+    return embeddings / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Select the k highest scores along the last axis with a partial selection instead of a full sort.
+
+    Args:
+        scores (np.ndarray): Scores of shape (n,) or (num_queries, n).
+        k (int): The number of scores to select. Clipped to n.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The indices and scores of the top k, sorted by descending score.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        empty_shape = scores.shape[:-1] + (0,)
+        return np.empty(empty_shape, dtype=np.int64), np.empty(empty_shape, dtype=scores.dtype)
+    if k < n:
+        indices = np.argpartition(scores, n - k, axis=-1)[..., n - k:]
+    else:
+        indices = np.broadcast_to(np.arange(n), scores.shape).copy()
+    selected = np.take_along_axis(scores, indices, axis=-1)
+    order = np.argsort(-selected, axis=-1, kind="stable")
+    return np.take_along_axis(indices, order, axis=-1), np.take_along_axis(selected, order, axis=-1)
+
+
+def cosine_top_k(queries,
+                 normalized_matrix: np.ndarray,
+                 k: int = 10,
+                 chunk_size: int | None = None,
+                 normalize_matrix: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """Score one query or a batch of queries against an embedding matrix and return the top k rows.
+
+    Each query batch is scored with a single matrix product. When chunk_size is given, the matrix is scored in slices
+    of chunk_size rows and the running top k is merged after each slice, so the matrix can be an np.memmap which is
+    larger than memory.
+
+    Args:
+        queries: A query embedding of shape (dim,) or a batch of shape (num_queries, dim).
+        normalized_matrix (np.ndarray): The embedding matrix of shape (n, dim), normalized with normalize_embeddings.
+        k (int, optional): The number of rows to return per query. Defaults to 10.
+        chunk_size (int, optional): The number of rows scored at a time. Defaults to None, scoring the whole matrix.
+        normalize_matrix (bool, optional): Normalize each slice of the matrix on the fly, for matrices which were
+            not normalized in advance. Defaults to False.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The row indices and cosine similarities, of shape (k,) for a single query or
+            (num_queries, k) for a batch, sorted by descending similarity.
+    """
+    queries = normalize_embeddings(queries)
+    single_query = queries.ndim == 1
+    queries = np.atleast_2d(queries)
+    num_rows = normalized_matrix.shape[0]
+    if chunk_size is None:
+        chunk_size = max(num_rows, 1)
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    best_indices = np.empty((queries.shape[0], 0), dtype=np.int64)
+    best_scores = np.empty((queries.shape[0], 0), dtype=queries.dtype)
+    for start in range(0, num_rows, chunk_size):
+        chunk = normalized_matrix[start:start + chunk_size]
+        chunk = normalize_embeddings(chunk) if normalize_matrix else np.asarray(chunk, dtype=np.float32)
+        chunk_indices, chunk_scores = top_k(queries @ chunk.T, k)
+        candidate_indices = np.concatenate([best_indices, chunk_indices + start], axis=1)
+        candidate_scores = np.concatenate([best_scores, chunk_scores], axis=1)
+        order, best_scores = top_k(candidate_scores, k)
+        best_indices = np.take_along_axis(candidate_indices, order, axis=1)
+
+    if single_query:
+        return best_indices[0], best_scores[0]
+    return best_indices, best_scores
@@ -1,38 +1,190 @@
 """Methods for counting and converting tokens. Note that this is not a comprehensive list of all tokenization methods.
  Only few encoding schemes are supported."""
 
+import functools
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
 import tiktoken
 
 DEFAULT_ENCODING_NAME = "cl100k_base"
+DEFAULT_NUM_THREADS = 8
+DEFAULT_TOKEN_CACHE_SIZE = 100_000
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@functools.lru_cache(maxsize=None)
+def _encoding_for_model(model: str) -> tiktoken.Encoding:
+    """Resolve the encoding of a model once per process."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        msg = f"Failed to get encoding for {model} when getting num_tokens_from_string. Fall back to default encoding {DEFAULT_ENCODING_NAME}"
+        logger.warning(msg)
+        return tiktoken.get_encoding(DEFAULT_ENCODING_NAME)
+
+
+def get_encoding(model: str | None = None, encoding_name: str | None = None) -> tiktoken.Encoding:
+    """Return the encoding for a model or an encoding name. Resolved encodings are kept for the lifetime of the process.
+
+    Args:
+        model (str, optional): The model whose encoding should be used. Takes precedence over encoding_name.
+        encoding_name (str, optional): The name of the encoding. Defaults to DEFAULT_ENCODING_NAME.
+    Returns:
+        tiktoken.Encoding: The encoding.
+    """
+    if model is not None:
+        return _encoding_for_model(model)
+    # tiktoken.get_encoding keeps its own registry of constructed encodings.
+    return tiktoken.get_encoding(encoding_name or DEFAULT_ENCODING_NAME)
+
+
 def num_tokens_from_string(
     string: str, model: str | None = None, encoding_name: str | None = None
 ) -> int:
     """Return the number of tokens in a text string."""
-    if model is not None:
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            msg = f"Failed to get encoding for {model} when getting num_tokens_from_string. Fall back to default encoding {DEFAULT_ENCODING_NAME}"
-            logger.warning(msg)
-            encoding = tiktoken.get_encoding(DEFAULT_ENCODING_NAME)
-    else:
-        encoding = tiktoken.get_encoding(encoding_name or DEFAULT_ENCODING_NAME)
+    encoding = get_encoding(model=model, encoding_name=encoding_name)
     return len(encoding.encode(string))
 
+
+def count_tokens_batch(
+    texts: Iterable[str],
+    model: str | None = None,
+    encoding_name: str | None = None,
+    num_threads: int = DEFAULT_NUM_THREADS,
+) -> list[int]:
+    """Return the number of tokens of every text, encoding them with tiktoken's multithreaded encode_batch.
+
+    Args:
+        texts (Iterable[str]): The texts to count tokens for.
+        model (str, optional): The model whose encoding should be used.
+        encoding_name (str, optional): The name of the encoding. Defaults to DEFAULT_ENCODING_NAME.
+        num_threads (int, optional): The number of threads used by tiktoken. Defaults to DEFAULT_NUM_THREADS.
+    Returns:
+        list[int]: The number of tokens of every text, in input order.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    encoding = get_encoding(model=model, encoding_name=encoding_name)
+    return [len(tokens) for tokens in encoding.encode_batch(texts, num_threads=num_threads)]
+
+
 def string_from_tokens(
     tokens: list[int], model: str | None = None, encoding_name: str | None = None
 ) -> str:
     """Return a text string from a list of tokens."""
-    if model is not None:
-        encoding = tiktoken.encoding_for_model(model)
-    elif encoding_name is not None:
-        encoding = tiktoken.get_encoding(encoding_name)
-    else:
+    if model is None and encoding_name is None:
         msg = "Either model or encoding_name must be specified."
         raise ValueError(msg)
+    encoding = get_encoding(model=model, encoding_name=encoding_name)
     return encoding.decode(tokens)
+
+
+class TokenCounter:
+    """Counts tokens for one encoding and memoizes the counts by content hash in a bounded LRU.
+
+    Useful when the same texts are counted repeatedly, e.g. when a corpus is re-ingested. The counter is
+    thread safe and can be shared within a process.
+    """
+
+    def __init__(self,
+                 model: str | None = None,
+                 encoding_name: str | None = None,
+                 cache_size: int = DEFAULT_TOKEN_CACHE_SIZE,
+                 num_threads: int = DEFAULT_NUM_THREADS):
+        """
+        Args:
+            model (str, optional): The model whose encoding should be used.
+            encoding_name (str, optional): The name of the encoding. Defaults to DEFAULT_ENCODING_NAME.
+            cache_size (int, optional): Maximum number of memoized counts. 0 disables memoization.
+            num_threads (int, optional): The number of threads used by tiktoken for batch encoding.
+        """
+        if cache_size < 0:
+            raise ValueError("cache_size must be non-negative")
+        self.encoding = get_encoding(model=model, encoding_name=encoding_name)
+        self.cache_size = cache_size
+        self.num_threads = num_threads
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def _lookup(self, key: bytes) -> int | None:
+        with self._lock:
+            count = self._cache.get(key)
+            if count is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return count
+
+    def _store(self, key: bytes, count: int) -> None:
+        with self._lock:
+            self._cache[key] = count
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def count_tokens(self, text: str) -> int:
+        """Return the number of tokens in a text string."""
+        if not self.cache_size:
+            return len(self.encoding.encode(text))
+        key = self._key(text)
+        count = self._lookup(key)
+        if count is None:
+            count = len(self.encoding.encode(text))
+            self._store(key, count)
+        return count
+
+    def count_tokens_batch(self, texts: Iterable[str]) -> list[int]:
+        """Return the number of tokens of every text. Only texts missing from the cache are encoded.
+
+        Args:
+            texts (Iterable[str]): The texts to count tokens for.
+        Returns:
+            list[int]: The number of tokens of every text, in input order.
+        """
+        texts = list(texts)
+        if not self.cache_size:
+            if not texts:
+                return []
+            return [len(tokens) for tokens in self.encoding.encode_batch(texts, num_threads=self.num_threads)]
+
+        counts: list[int | None] = []
+        missing: dict[bytes, list[int]] = {}
+        missing_texts = []
+        for index, text in enumerate(texts):
+            key = self._key(text)
+            count = self._lookup(key)
+            counts.append(count)
+            if count is None:
+                if key not in missing:
+                    missing[key] = []
+                    missing_texts.append(text)
+                missing[key].append(index)
+
+        if missing_texts:
+            encoded = self.encoding.encode_batch(missing_texts, num_threads=self.num_threads)
+            for (key, indices), tokens in zip(missing.items(), encoded):
+                self._store(key, len(tokens))
+                for index in indices:
+                    counts[index] = len(tokens)
+        return counts
+
+    def clear(self) -> None:
+        """Drop all memoized counts and reset the hit/miss counters."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
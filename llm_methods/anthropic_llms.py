@@ -1,5 +1,8 @@
 import logging
-from llm_methods.config_files.anthropic_config import (ANTHROPIC_CLIENT, ANTHROPIC_MODELS_DICT)
+from llm_methods.config_files.anthropic_config import (ANTHROPIC_CLIENT, ASYNC_ANTHROPIC_CLIENT, ANTHROPIC_MODELS_DICT)
+from llm_methods.prompt_caching import ANTHROPIC_CACHE_CONTROL, PROMPT_CACHE_STATS, CachedResponse, CacheUsage
+from llm_methods.provider_limits import ANTHROPIC_PROVIDER, provider_semaphore
+from llm_methods.streaming import AsyncResponseStream, ResponseStream, Usage
 
 
 logging.basicConfig(level=logging.INFO)
@@ -61,3 +64,223 @@ def get_response_from_anthropic_models(model: str,
     except Exception as e:
         logger.exception(f"Failed to get response from model '{model}'")
         raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+
+async def get_response_from_anthropic_models_async(model: str,
+                                                   prompt: str,
+                                                   system_prompt: str = None,
+                                                   temperature: float = 0,
+                                                   max_tokens: int = 4096) -> str:
+    """Async version of get_response_from_anthropic_models, using the shared async client and at most
+    PROVIDER_CONCURRENCY_LIMITS[ANTHROPIC_PROVIDER] requests in flight.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found or the response structure is invalid.
+        RuntimeError: If the API call fails.
+    """
+
+    if model not in ANTHROPIC_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in ANTHROPIC_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in ANTHROPIC_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        messages = [{"role": "user", "content": [{"type": "text", "text": prompt}] }]
+        optional_parameters = {"system": system_prompt} if system_prompt else {}
+
+        async with provider_semaphore(ANTHROPIC_PROVIDER):
+            response = await ASYNC_ANTHROPIC_CLIENT.messages.create(
+                model=ANTHROPIC_MODELS_DICT[model],
+                max_tokens=max_tokens,
+                messages=messages,
+                temperature=temperature,
+                **optional_parameters
+            )
+
+        if not response.content:
+            logger.error("Invalid response structure received from the model")
+            raise ValueError("Invalid response structure received from the model")
+
+        return response.content[0].text
+    except Exception as e:
+        logger.exception(f"Failed to get response from model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+
+def stream_response_from_anthropic_models(model: str,
+                                          prompt: str,
+                                          system_prompt: str = None,
+                                          temperature: float = 0,
+                                          max_tokens: int = 4096) -> ResponseStream:
+    """Stream output from anthropic models
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        ResponseStream: Iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in ANTHROPIC_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in ANTHROPIC_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in ANTHROPIC_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    def events():
+        try:
+            messages = [{"role": "user", "content": [{"type": "text", "text": prompt}] }]
+            optional_parameters = {"system": system_prompt} if system_prompt else {}
+
+            with ANTHROPIC_CLIENT.messages.stream(
+                model=ANTHROPIC_MODELS_DICT[model],
+                max_tokens=max_tokens,
+                messages=messages,
+                temperature=temperature,
+                **optional_parameters
+            ) as stream:
+                yield from stream.text_stream
+                usage = stream.get_final_message().usage
+            yield Usage(usage.input_tokens, usage.output_tokens)
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return ResponseStream(events())
+
+
+def stream_response_from_anthropic_models_async(model: str,
+                                                prompt: str,
+                                                system_prompt: str = None,
+                                                temperature: float = 0,
+                                                max_tokens: int = 4096) -> AsyncResponseStream:
+    """Async version of stream_response_from_anthropic_models, with at most
+    PROVIDER_CONCURRENCY_LIMITS[ANTHROPIC_PROVIDER] streams open at a time.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        AsyncResponseStream: Async iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in ANTHROPIC_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in ANTHROPIC_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in ANTHROPIC_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    async def events():
+        try:
+            messages = [{"role": "user", "content": [{"type": "text", "text": prompt}] }]
+            optional_parameters = {"system": system_prompt} if system_prompt else {}
+
+            async with provider_semaphore(ANTHROPIC_PROVIDER):
+                async with ASYNC_ANTHROPIC_CLIENT.messages.stream(
+                    model=ANTHROPIC_MODELS_DICT[model],
+                    max_tokens=max_tokens,
+                    messages=messages,
+                    temperature=temperature,
+                    **optional_parameters
+                ) as stream:
+                    async for text in stream.text_stream:
+                        yield text
+                    usage = (await stream.get_final_message()).usage
+            yield Usage(usage.input_tokens, usage.output_tokens)
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return AsyncResponseStream(events())
+
+
+def get_response_from_anthropic_models_with_prompt_caching(model: str,
+                                                           prompt: str,
+                                                           system_prompt: str = None,
+                                                           cached_prefix: str = None,
+                                                           temperature: float = 0,
+                                                           max_tokens: int = 4096) -> CachedResponse:
+    """Get output from anthropic models, caching the system prompt and a prompt prefix on the provider side.
+
+    The system prompt and the cached_prefix, which is sent before the prompt, are marked with cache_control, so calls
+    repeating them within the cache lifetime read them from the cache instead of reprocessing them. Prefixes shorter
+    than the minimum cacheable length of the model are not cached by the provider.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model and cache. Defaults to None.
+        cached_prefix (str, optional): A long, reused part of the prompt, e.g. a document, to send before the prompt
+            and cache. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        CachedResponse: The generated response and its usage, including the tokens written to and read from the cache.
+
+    Raises:
+        ValueError: If the model is not found or the response structure is invalid.
+        RuntimeError: If the API call fails.
+    """
+
+    if model not in ANTHROPIC_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in ANTHROPIC_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in ANTHROPIC_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        content = [{"type": "text", "text": prompt}]
+        if cached_prefix:
+            content.insert(0, {"type": "text", "text": cached_prefix, "cache_control": ANTHROPIC_CACHE_CONTROL})
+        messages = [{"role": "user", "content": content}]
+        optional_parameters = {}
+        if system_prompt:
+            optional_parameters["system"] = [{"type": "text", "text": system_prompt,
+                                              "cache_control": ANTHROPIC_CACHE_CONTROL}]
+
+        response = ANTHROPIC_CLIENT.messages.create(
+            model=ANTHROPIC_MODELS_DICT[model],
+            max_tokens=max_tokens,
+            messages=messages,
+            temperature=temperature,
+            **optional_parameters
+        )
+
+        if not response.content:
+            logger.error("Invalid response structure received from the model")
+            raise ValueError("Invalid response structure received from the model")
+
+        usage = CacheUsage(input_tokens=response.usage.input_tokens,
+                           output_tokens=response.usage.output_tokens,
+                           cache_creation_input_tokens=response.usage.cache_creation_input_tokens or 0,
+                           cache_read_input_tokens=response.usage.cache_read_input_tokens or 0)
+        PROMPT_CACHE_STATS.record(ANTHROPIC_PROVIDER, usage)
+        logger.debug(f"Prompt cache usage of model '{model}': {usage}")
+        return CachedResponse(response.content[0].text, usage)
+    except Exception as e:
+        logger.exception(f"Failed to get response from model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': {e}")
@@ -0,0 +1,341 @@
+"""Offline bulk jobs through the provider batch APIs (OpenAI Batch API, Anthropic Message Batches).
+
+run_bulk_job writes the requests to JSONL files, submits them in jobs of at most the backend's max_requests_per_job
+requests and max_bytes_per_job bytes (one model per job for backends with one_model_per_job), polls the jobs with exponential backoff and maps the results back to the caller ids. Every step is recorded
+in a job-state file, so after a crash calling run_bulk_job again with the same state_path resumes polling the submitted
+jobs instead of resubmitting them, and collected results are read back from disk.
+
+LocalBatchBackend answers the requests from a local function with a file-based job lifecycle, so the whole flow runs
+without network access.
+"""
+
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from typing import Any, Callable, Iterator, NamedTuple
+
+from llm_methods.chat_messages import chat_messages
+from llm_methods.config_files.anthropic_config import ANTHROPIC_CLIENT, ANTHROPIC_MODELS_DICT
+from llm_methods.config_files.openai_config import OPENAI_CLIENT, OPENAI_MODELS_DICT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Normalized job statuses. ENDED jobs have results, possibly only for some requests; FAILED jobs have none.
+JOB_IN_PROGRESS = "in_progress"
+JOB_ENDED = "ended"
+JOB_FAILED = "failed"
+
+DEFAULT_POLL_INTERVAL_SECONDS = 30.0
+MAX_POLL_INTERVAL_SECONDS = 600.0
+POLL_BACKOFF_FACTOR = 1.5
+
+
+class BulkRequest(NamedTuple):
+    """A request of a bulk job. id is the caller's id of the request, a string or an integer."""
+    id: str | int
+    model: str
+    prompt: str
+    system_prompt: str | None = None
+    temperature: float = 0
+    max_tokens: int = 4096
+
+
+class BulkResult(NamedTuple):
+    """The response of a request of a bulk job, or the error when it failed."""
+    id: str | int
+    text: str | None
+    error: str | None = None
+
+
+def _write_jsonl(path: str, records) -> None:
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    os.replace(temporary_path, path)
+
+
+def _read_jsonl(path: str) -> Iterator[dict]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _write_json(path: str, data) -> None:
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary_path, path)
+
+
+class OpenAIBatchBackend:
+    """Submits chat completion requests through the OpenAI Batch API."""
+
+    name = "openai"
+    max_requests_per_job = 50_000
+    max_bytes_per_job = 200 * 1024 * 1024
+    # Every line of a batch input file must use the same model.
+    one_model_per_job = True
+
+    def __init__(self, completion_window: str = "24h"):
+        self.completion_window = completion_window
+
+    def format_request(self, custom_id: str, request: BulkRequest) -> dict:
+        if request.model not in OPENAI_MODELS_DICT:
+            raise ValueError(f"Model '{request.model}' not found in OPENAI_MODELS_DICT."
+                             f" Currently the model is not supported.")
+        return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions",
+                "body": {"model": OPENAI_MODELS_DICT[request.model],
+                         "messages": chat_messages(request.prompt, request.system_prompt),
+                         "temperature": request.temperature, "max_tokens": request.max_tokens}}
+
+    def submit(self, requests_path: str) -> str:
+        with open(requests_path, "rb") as f:
+            input_file = OPENAI_CLIENT.files.create(file=f, purpose="batch")
+        batch = OPENAI_CLIENT.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions",
+                                             completion_window=self.completion_window)
+        return batch.id
+
+    def poll(self, job_id: str) -> str:
+        status = OPENAI_CLIENT.batches.retrieve(job_id).status
+        if status in ("completed", "expired", "cancelled"):
+            return JOB_ENDED
+        if status == "failed":
+            return JOB_FAILED
+        return JOB_IN_PROGRESS
+
+    def results(self, job_id: str) -> Iterator[tuple[str, str | None, str | None]]:
+        batch = OPENAI_CLIENT.batches.retrieve(job_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in OPENAI_CLIENT.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    yield record["custom_id"], None, json.dumps(record.get("error") or response.get("body"))
+                else:
+                    yield record["custom_id"], response["body"]["choices"][0]["message"]["content"], None
+
+
+class AnthropicBatchBackend:
+    """Submits message requests through the Anthropic Message Batches API."""
+
+    name = "anthropic"
+    max_requests_per_job = 100_000
+    max_bytes_per_job = 256 * 1024 * 1024
+    one_model_per_job = False
+
+    def format_request(self, custom_id: str, request: BulkRequest) -> dict:
+        if request.model not in ANTHROPIC_MODELS_DICT:
+            raise ValueError(f"Model '{request.model}' not found in ANTHROPIC_MODELS_DICT."
+                             f" Currently the model is not supported.")
+        params = {"model": ANTHROPIC_MODELS_DICT[request.model],
+                  "max_tokens": request.max_tokens,
+                  "messages": [{"role": "user", "content": [{"type": "text", "text": request.prompt}]}],
+                  "temperature": request.temperature}
+        if request.system_prompt:
+            params["system"] = request.system_prompt
+        return {"custom_id": custom_id, "params": params}
+
+    def submit(self, requests_path: str) -> str:
+        return ANTHROPIC_CLIENT.messages.batches.create(requests=list(_read_jsonl(requests_path))).id
+
+    def poll(self, job_id: str) -> str:
+        status = ANTHROPIC_CLIENT.messages.batches.retrieve(job_id).processing_status
+        return JOB_ENDED if status == "ended" else JOB_IN_PROGRESS
+
+    def results(self, job_id: str) -> Iterator[tuple[str, str | None, str | None]]:
+        for entry in ANTHROPIC_CLIENT.messages.batches.results(job_id):
+            if entry.result.type == "succeeded":
+                yield entry.custom_id, entry.result.message.content[0].text, None
+            elif entry.result.type == "errored":
+                yield entry.custom_id, None, str(entry.result.error)
+            else:
+                yield entry.custom_id, None, f"Request {entry.result.type}"
+
+
+class LocalBatchBackend:
+    """File-based stand-in for a provider batch API. Jobs live in a directory and are answered by a local function
+    once completion_delay seconds have passed since their submission."""
+
+    name = "local"
+    max_requests_per_job = 50_000
+    max_bytes_per_job = 200 * 1024 * 1024
+    one_model_per_job = False
+
+    def __init__(self,
+                 directory: str,
+                 respond: Callable[[BulkRequest], str] | None = None,
+                 completion_delay: float = 0):
+        """
+        Args:
+            directory (str): The directory holding the jobs, created when it does not exist.
+            respond (Callable[[BulkRequest], str], optional): Returns the response to a request. An exception marks
+                the request as failed. Defaults to echoing the prompt.
+            completion_delay (float, optional): The seconds a job stays in progress. Defaults to 0.
+        """
+        self.directory = directory
+        self.respond = respond or (lambda request: request.prompt)
+        self.completion_delay = completion_delay
+        os.makedirs(directory, exist_ok=True)
+
+    def format_request(self, custom_id: str, request: BulkRequest) -> dict:
+        return {"custom_id": custom_id, "request": request._asdict()}
+
+    def _job_path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.directory, job_id, name)
+
+    def submit(self, requests_path: str) -> str:
+        job_id = f"local-{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.directory, job_id))
+        _write_jsonl(self._job_path(job_id, "input.jsonl"), _read_jsonl(requests_path))
+        _write_json(self._job_path(job_id, "job.json"), {"submitted_at": time.time(), "status": JOB_IN_PROGRESS})
+        return job_id
+
+    def poll(self, job_id: str) -> str:
+        with open(self._job_path(job_id, "job.json")) as f:
+            job = json.load(f)
+        if job["status"] == JOB_IN_PROGRESS and time.time() - job["submitted_at"] >= self.completion_delay:
+            outputs = []
+            for record in _read_jsonl(self._job_path(job_id, "input.jsonl")):
+                try:
+                    outputs.append({"custom_id": record["custom_id"],
+                                    "text": self.respond(BulkRequest(**record["request"])), "error": None})
+                except Exception as e:
+                    outputs.append({"custom_id": record["custom_id"], "text": None, "error": str(e)})
+            _write_jsonl(self._job_path(job_id, "output.jsonl"), outputs)
+            job["status"] = JOB_ENDED
+            _write_json(self._job_path(job_id, "job.json"), job)
+        return job["status"]
+
+    def results(self, job_id: str) -> Iterator[tuple[str, str | None, str | None]]:
+        for record in _read_jsonl(self._job_path(job_id, "output.jsonl")):
+            yield record["custom_id"], record["text"], record["error"]
+
+
+def _submit_jobs(requests: list[BulkRequest], backend, state_path: str) -> dict:
+    state = {"backend": backend.name, "ids": {}, "jobs": []}
+
+    def add_job(lines: list[str]) -> None:
+        job_index = len(state["jobs"])
+        requests_path = f"{state_path}.{job_index}.requests.jsonl"
+        temporary_path = f"{requests_path}.tmp"
+        with open(temporary_path, "w") as f:
+            f.writelines(lines)
+        os.replace(temporary_path, requests_path)
+        state["jobs"].append({"requests_path": requests_path, "job_id": None, "status": None,
+                              "results_path": f"{state_path}.{job_index}.results.jsonl"})
+
+    groups: dict[str | None, list[int]] = {}
+    for index, request in enumerate(requests):
+        groups.setdefault(request.model if backend.one_model_per_job else None, []).append(index)
+    for indices in groups.values():
+        lines = []
+        num_bytes = 0
+        for index in indices:
+            custom_id = f"request-{index}"
+            state["ids"][custom_id] = requests[index].id
+            line = json.dumps(backend.format_request(custom_id, requests[index])) + "\n"
+            line_bytes = len(line.encode("utf-8"))
+            if lines and (len(lines) == backend.max_requests_per_job
+                          or num_bytes + line_bytes > backend.max_bytes_per_job):
+                add_job(lines)
+                lines = []
+                num_bytes = 0
+            lines.append(line)
+            num_bytes += line_bytes
+        if lines:
+            add_job(lines)
+    _write_json(state_path, state)
+    return state
+
+
+def run_bulk_job(requests: list[BulkRequest],
+                 backend,
+                 state_path: str,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+                 max_poll_interval: float = MAX_POLL_INTERVAL_SECONDS,
+                 timeout: float | None = None) -> dict[Any, BulkResult]:
+    """Run requests through a batch API and return their results, resuming from state_path when it exists.
+
+    Args:
+        requests (list[BulkRequest]): The requests, with unique ids. Ignored when resuming.
+        backend: OpenAIBatchBackend, AnthropicBatchBackend or LocalBatchBackend.
+        state_path (str): The job-state file. The request and result JSONL files are written next to it.
+        poll_interval (float, optional): The first delay between two status checks, growing by POLL_BACKOFF_FACTOR.
+            Defaults to DEFAULT_POLL_INTERVAL_SECONDS.
+        max_poll_interval (float, optional): The maximum delay between two status checks.
+            Defaults to MAX_POLL_INTERVAL_SECONDS.
+        timeout (float, optional): The maximum time to wait for the jobs in seconds. Defaults to None, waiting until
+            they end. The state is kept, so a later call resumes waiting.
+    Returns:
+        dict[Any, BulkResult]: The result of every request by request id. Requests without a result from the provider
+            have an error.
+
+    Raises:
+        ValueError: If a model is not supported by the backend, the ids are not unique, or the state belongs to another
+            backend.
+        RuntimeError: If a job fails or the timeout is exceeded. Failed jobs are submitted again when resuming.
+    """
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state["backend"] != backend.name:
+            raise ValueError(f"The job state in '{state_path}' belongs to backend '{state['backend']}'.")
+        logger.info(f"Resuming bulk job from '{state_path}'.")
+    else:
+        if len({json.dumps(request.id) for request in requests}) != len(requests):
+            raise ValueError("The request ids must be unique.")
+        state = _submit_jobs(requests, backend, state_path)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for job in state["jobs"]:
+        if job["status"] == JOB_FAILED:
+            # A job which failed before the state was saved is submitted again.
+            logger.info(f"Resubmitting failed bulk job '{job['job_id']}' to backend '{backend.name}'.")
+            job["job_id"] = None
+        if job["job_id"] is None:
+            job["job_id"] = backend.submit(job["requests_path"])
+            job["status"] = JOB_IN_PROGRESS
+            _write_json(state_path, state)
+            logger.info(f"Submitted bulk job '{job['job_id']}' to backend '{backend.name}'.")
+
+    delay = poll_interval
+    while True:
+        for job in state["jobs"]:
+            if job["status"] == JOB_IN_PROGRESS:
+                job["status"] = backend.poll(job["job_id"])
+                if job["status"] == JOB_FAILED:
+                    _write_json(state_path, state)
+                    raise RuntimeError(f"Bulk job '{job['job_id']}' failed on backend '{backend.name}'.")
+                if job["status"] == JOB_ENDED:
+                    _write_jsonl(job["results_path"],
+                                 ({"custom_id": custom_id, "text": text, "error": error}
+                                  for custom_id, text, error in backend.results(job["job_id"])))
+                    _write_json(state_path, state)
+                    logger.info(f"Collected the results of bulk job '{job['job_id']}'.")
+        if all(job["status"] in (JOB_ENDED, JOB_FAILED) for job in state["jobs"]):
+            break
+        if deadline is not None and time.monotonic() + delay > deadline:
+            raise RuntimeError(f"Bulk jobs did not end within {timeout} s. Call run_bulk_job with state_path "
+                               f"'{state_path}' to resume.")
+        time.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(max_poll_interval, delay * POLL_BACKOFF_FACTOR)
+
+    results = {}
+    for job in state["jobs"]:
+        for record in _read_jsonl(job["results_path"]):
+            request_id = state["ids"][record["custom_id"]]
+            results[json.dumps(request_id)] = BulkResult(request_id, record["text"], record["error"])
+    missing = [request_id for request_id in state["ids"].values() if json.dumps(request_id) not in results]
+    for request_id in missing:
+        results[json.dumps(request_id)] = BulkResult(request_id, None, "No result returned by the provider")
+    return {result.id: result for result in results.values()}
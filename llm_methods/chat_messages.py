@@ -0,0 +1,12 @@
+"""Message lists of the OpenAI-compatible chat completion APIs (OpenAI, Together, Fireworks)."""
+
+
+def chat_messages(prompt: str, system_prompt: str = None) -> list[dict[str, str]]:
+    """Return the messages of a chat completion request with an optional system prompt and one user prompt."""
+    messages = []
+
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+
+    messages.append({"role": "user", "content": prompt})
+    return messages
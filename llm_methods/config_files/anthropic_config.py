@@ -6,6 +6,7 @@ import os
 load_dotenv()
 
 ANTHROPIC_CLIENT = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+ASYNC_ANTHROPIC_CLIENT = anthropic.AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
 
 ANTHROPIC_MODELS_DICT = {
     "claude-3.5-sonnet": "claude-3-5-sonnet-20241022",
@@ -1,4 +1,4 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
 import os
 
@@ -6,6 +6,7 @@ import os
 load_dotenv()
 
 OPENAI_CLIENT = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+ASYNC_OPENAI_CLIENT = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
 OPENAI_MODELS_DICT = {"gpt-4o": "gpt-4o-2024-08-06",
                       "gpt-4-turbo": "gpt-4-turbo-2024-04-09",
@@ -1,4 +1,4 @@
-from together import Together
+from together import AsyncTogether, Together
 from dotenv import load_dotenv
 import os
 
@@ -6,6 +6,7 @@ import os
 load_dotenv()
 
 TOGETHER_CLIENT = Together(api_key=os.environ.get("TOGETHER_API_KEY"))
+ASYNC_TOGETHER_CLIENT = AsyncTogether(api_key=os.environ.get("TOGETHER_API_KEY"))
 
 TOGETHER_MODELS_URL_DICT = {"llama3-70b-chat": "meta-llama/Llama-3-70b-chat-hf",
                             "qwen2-72b-instruct": "Qwen/Qwen2-72B-Instruct",
@@ -0,0 +1,147 @@
+"""Persistent, content-addressed cache of embeddings in SQLite.
+
+Entries are keyed by the model and the sha256 of the normalized text and store the embedding as a float32 blob.
+The cache is bounded by a maximum number of entries; the least recently used entries are evicted first. To keep
+lookups read-only most of the time, the last access time of an entry is only refreshed when it is older than
+TOUCH_INTERVAL_SECONDS. Every process counts the entries it writes itself, so with several writer processes the bound
+is approximate.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1_000_000
+TOUCH_INTERVAL_SECONDS = 3600
+# SQLite limits the number of parameters of a statement.
+_LOOKUP_CHUNK_SIZE = 500
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a text the way it is sent to the embedding endpoint."""
+    return text.replace("\n", " ")
+
+
+def cache_key(model: str, text: str) -> bytes:
+    """Return the cache key of a text embedded with a model."""
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8", "surrogatepass")).digest()
+
+
+class EmbeddingCache:
+    """Size-bounded SQLite cache of embeddings, shared safely between threads and processes."""
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path (str): The path of the SQLite database, created when it does not exist.
+            max_entries (int, optional): The maximum number of cached embeddings. Defaults to DEFAULT_MAX_ENTRIES.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+                                        id INTEGER PRIMARY KEY,
+                                        key BLOB NOT NULL UNIQUE,
+                                        model TEXT NOT NULL,
+                                        vector BLOB NOT NULL,
+                                        last_access REAL NOT NULL)""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._num_entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._num_entries
+
+    def get(self, model: str, text: str) -> np.ndarray | None:
+        """Return the cached float32 embedding of a text, or None."""
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: list[str]) -> list[np.ndarray | None]:
+        """Return the cached float32 embedding of every text, or None for the texts which are not cached.
+
+        Args:
+            model (str): The embedding model.
+            texts (list[str]): The texts to look up.
+        Returns:
+            list[np.ndarray | None]: The embeddings, in input order.
+        """
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+        now = time.time()
+        stale = []
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK_SIZE):
+                chunk = keys[start:start + _LOOKUP_CHUNK_SIZE]
+                rows = self._connection.execute(
+                    f"SELECT key, vector, last_access FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for key, vector, last_access in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+                    if now - last_access > TOUCH_INTERVAL_SECONDS:
+                        stale.append((now, key))
+            if stale:
+                self._connection.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", stale)
+            results = [found.get(key) for key in keys]
+            num_hits = sum(result is not None for result in results)
+            self.hits += num_hits
+            self.misses += len(results) - num_hits
+        return results
+
+    def put(self, model: str, text: str, embedding) -> None:
+        """Cache the embedding of a text."""
+        self.put_many(model, [text], [embedding])
+
+    def put_many(self, model: str, texts: list[str], embeddings) -> None:
+        """Cache the embeddings of many texts, evicting the least recently used entries beyond max_entries.
+
+        Args:
+            model (str): The embedding model.
+            texts (list[str]): The texts.
+            embeddings: The embedding of every text.
+        """
+        now = time.time()
+        rows = [(cache_key(model, text), model, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+                for text, embedding in zip(texts, embeddings)]
+        with self._lock:
+            changes = self._connection.total_changes
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)", rows)
+                num_entries = self._num_entries + self._connection.total_changes - changes
+                excess = num_entries - self.max_entries
+                if excess > 0:
+                    self._connection.execute("DELETE FROM embeddings WHERE id IN "
+                                             "(SELECT id FROM embeddings ORDER BY last_access LIMIT ?)", (excess,))
+                    num_entries -= excess
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._num_entries = num_entries
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit and miss counters and the number of entries."""
+        return {"hits": self.hits, "misses": self.misses, "entries": self._num_entries}
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._connection.execute("DELETE FROM embeddings")
+            self._num_entries = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        self._connection.close()
@@ -1,5 +1,9 @@
 import logging
-from llm_methods.config_files.fireworks_config import (FIREWORKS_CLIENT, FIREWORKS_MODELS_URL_DICT)
+from llm_methods.chat_messages import chat_messages
+from llm_methods.config_files.fireworks_config import (FIREWORKS_CLIENT, ASYNC_FIREWORKS_CLIENT, FIREWORKS_MODELS_URL_DICT)
+from llm_methods.provider_limits import FIREWORKS_PROVIDER, provider_semaphore
+from llm_methods.streaming import (AsyncResponseStream, ResponseStream, chat_completion_events,
+                                  chat_completion_events_async)
 
 
 logging.basicConfig(level=logging.INFO)
@@ -10,7 +14,8 @@ def get_response_from_fireworks_models(model: str,
                                        prompt: str,
                                        temperature: float = 0,
                                        max_tokens: int = 4096,
-                                       context_length_exceeded_behavior: str = "truncate") -> str:
+                                       context_length_exceeded_behavior: str = "truncate",
+                                       system_prompt: str = None) -> str:
     """Get output from fireworks models
 
     Args:
@@ -19,6 +24,7 @@ def get_response_from_fireworks_models(model: str,
         temperature (float, optional): Sampling temperature. Defaults to 0.
         max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
         context_length_exceeded_behavior (str, optional): Behavior when context length is exceeded. Defaults to 'truncate'.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
 
     Returns:
         str: The generated response from the model.
@@ -36,7 +42,7 @@ def get_response_from_fireworks_models(model: str,
     try:
         response = FIREWORKS_CLIENT.chat.completions.create(
             model=FIREWORKS_MODELS_URL_DICT[model],
-            messages=[{"role": "user", "content": prompt, }],
+            messages=chat_messages(prompt, system_prompt),
             temperature=temperature,
             max_tokens=max_tokens,
             context_length_exceeded_behavior=context_length_exceeded_behavior)
@@ -49,4 +55,147 @@ def get_response_from_fireworks_models(model: str,
     except Exception as e:
         logger.exception(f"Failed to get response from model '{model}'")
         raise RuntimeError(f"Failed to get response from model '{model}': {e}")
-    
+
+
+async def get_response_from_fireworks_models_async(model: str,
+                                                   prompt: str,
+                                                   temperature: float = 0,
+                                                   max_tokens: int = 4096,
+                                                   context_length_exceeded_behavior: str = "truncate",
+                                                   system_prompt: str = None) -> str:
+    """Async version of get_response_from_fireworks_models, using the shared async client and at most
+    PROVIDER_CONCURRENCY_LIMITS[FIREWORKS_PROVIDER] requests in flight.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        context_length_exceeded_behavior (str, optional): Behavior when context length is exceeded. Defaults to 'truncate'.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found or the response structure is invalid.
+        RuntimeError: If the API call fails.
+    """
+
+    if model not in FIREWORKS_MODELS_URL_DICT:
+        logger.error(f"Model '{model}' not found in FIREWORKS_MODELS_URL_DICT.")
+        raise ValueError(f"Model '{model}' not found in FIREWORKS_MODELS_URL_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        async with provider_semaphore(FIREWORKS_PROVIDER):
+            response = await ASYNC_FIREWORKS_CLIENT.chat.completions.create(
+                model=FIREWORKS_MODELS_URL_DICT[model],
+                messages=chat_messages(prompt, system_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                context_length_exceeded_behavior=context_length_exceeded_behavior)
+
+        if not response.choices or not response.choices[0].message:
+            logger.error("Invalid response structure received from the model")
+            raise ValueError("Invalid response structure received from the model")
+
+        return response.choices[0].message.content
+    except Exception as e:
+        logger.exception(f"Failed to get response from model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+
+def stream_response_from_fireworks_models(model: str,
+                                          prompt: str,
+                                          system_prompt: str = None,
+                                          temperature: float = 0,
+                                          max_tokens: int = 4096,
+                                          context_length_exceeded_behavior: str = "truncate") -> ResponseStream:
+    """Stream output from fireworks models
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        context_length_exceeded_behavior (str, optional): Behavior when context length is exceeded. Defaults to 'truncate'.
+
+    Returns:
+        ResponseStream: Iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in FIREWORKS_MODELS_URL_DICT:
+        logger.error(f"Model '{model}' not found in FIREWORKS_MODELS_URL_DICT.")
+        raise ValueError(f"Model '{model}' not found in FIREWORKS_MODELS_URL_DICT."
+                         f" Currently the model is not supported.")
+
+    def events():
+        try:
+            response = FIREWORKS_CLIENT.chat.completions.create(
+                model=FIREWORKS_MODELS_URL_DICT[model],
+                messages=chat_messages(prompt, system_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                context_length_exceeded_behavior=context_length_exceeded_behavior,
+                stream=True)
+            yield from chat_completion_events(response)
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return ResponseStream(events())
+
+
+def stream_response_from_fireworks_models_async(model: str,
+                                                prompt: str,
+                                                system_prompt: str = None,
+                                                temperature: float = 0,
+                                                max_tokens: int = 4096,
+                                                context_length_exceeded_behavior: str = "truncate") -> AsyncResponseStream:
+    """Async version of stream_response_from_fireworks_models, with at most
+    PROVIDER_CONCURRENCY_LIMITS[FIREWORKS_PROVIDER] streams open at a time.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        context_length_exceeded_behavior (str, optional): Behavior when context length is exceeded. Defaults to 'truncate'.
+
+    Returns:
+        AsyncResponseStream: Async iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in FIREWORKS_MODELS_URL_DICT:
+        logger.error(f"Model '{model}' not found in FIREWORKS_MODELS_URL_DICT.")
+        raise ValueError(f"Model '{model}' not found in FIREWORKS_MODELS_URL_DICT."
+                         f" Currently the model is not supported.")
+
+    async def events():
+        try:
+            async with provider_semaphore(FIREWORKS_PROVIDER):
+                response = await ASYNC_FIREWORKS_CLIENT.chat.completions.create(
+                    model=FIREWORKS_MODELS_URL_DICT[model],
+                    messages=chat_messages(prompt, system_prompt),
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    context_length_exceeded_behavior=context_length_exceeded_behavior,
+                    stream=True)
+                async for event in chat_completion_events_async(response):
+                    yield event
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return AsyncResponseStream(events())
@@ -1,5 +1,12 @@
+import asyncio
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from llm_methods.config_files.google_config import (GOOGLE_MODELS_DICT, SAFETY_SETTINGS, DIFFERENT_TOP_K_MODELS)
+from llm_methods.prompt_caching import (GEMINI_CONTEXT_CACHE, PROMPT_CACHE_STATS, CachedResponse, CacheUsage,
+                                        GeminiContextCache)
+from llm_methods.provider_limits import GOOGLE_PROVIDER, provider_semaphore
+from llm_methods.streaming import AsyncResponseStream, ResponseStream, Usage
 import google.generativeai as genai
 from dotenv import load_dotenv
 import os
@@ -13,6 +20,38 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Number of GenerativeModel handles kept, one per (model, system_prompt, temperature, max_tokens).
+MODEL_HANDLE_CACHE_SIZE = 128
+DEFAULT_GOOGLE_CONCURRENCY = 8
+
+
+def _generation_config(model: str, temperature: float, max_tokens: int) -> dict:
+    return {"temperature": temperature,
+            "top_p": 0.95,
+            "top_k": 40 if model in DIFFERENT_TOP_K_MODELS else 64,
+            "max_output_tokens": max_tokens,
+            "response_mime_type": "text/plain",
+            }
+
+
+@functools.lru_cache(maxsize=MODEL_HANDLE_CACHE_SIZE)
+def _get_google_model(model: str, system_prompt: str, temperature: float, max_tokens: int) -> genai.GenerativeModel:
+    """Return the GenerativeModel for a model, system prompt and generation config, reused across calls. The handles
+    hold no conversation state, so they are shared between threads and event loops."""
+    optional_parameters = {"system_instruction": system_prompt} if system_prompt else {}
+    return genai.GenerativeModel(
+        model_name=GOOGLE_MODELS_DICT[model],
+        safety_settings=SAFETY_SETTINGS,
+        generation_config=_generation_config(model, temperature, max_tokens),
+        **optional_parameters,
+    )
+
+
+def _multimodal_contents(files: list, prompt: str) -> list[dict]:
+    # The files and the prompt are sent as two user turns, as with a chat session whose history holds the files.
+    return [{"role": "user", "parts": files}, {"role": "user", "parts": [prompt]}]
+
+
 def get_response_from_google_models(model: str,
                                     prompt: str,
                                     system_prompt: str = None,
@@ -40,38 +79,9 @@ def get_response_from_google_models(model: str,
                          f" Currently the model is not supported.")
 
     try:
-        if model in DIFFERENT_TOP_K_MODELS:
-            generation_config = {"temperature": temperature,
-                             "top_p": 0.95,
-                             "top_k": 40,
-                             "max_output_tokens": max_tokens,
-                             "response_mime_type": "text/plain",
-                             }
-        else:
-            generation_config = {"temperature": temperature,
-                             "top_p": 0.95,
-                             "top_k": 64,
-                             "max_output_tokens": max_tokens,
-                             "response_mime_type": "text/plain",
-                             }
-        
-        if system_prompt:
-            model_google = genai.GenerativeModel(
-                model_name=GOOGLE_MODELS_DICT[model],
-                safety_settings=SAFETY_SETTINGS,
-                generation_config=generation_config,
-                system_instruction=system_prompt,
-            )
-        else:
-            model_google = genai.GenerativeModel(
-                model_name=GOOGLE_MODELS_DICT[model],
-                safety_settings=SAFETY_SETTINGS,
-                generation_config=generation_config,
-            )
-        
-        chat_session = model_google.start_chat(history=[])
-
-        response = chat_session.send_message(prompt)
+        model_google = _get_google_model(model, system_prompt, temperature, max_tokens)
+
+        response = model_google.generate_content(prompt)
 
         return response.text
     except Exception as e:
@@ -108,43 +118,305 @@ def get_response_for_multimodal_prompts(model: str,
                          f" Currently the model is not supported.")
 
     try:
-        if model in DIFFERENT_TOP_K_MODELS:
-            generation_config = {"temperature": temperature,
-                             "top_p": 0.95,
-                             "top_k": 40,
-                             "max_output_tokens": max_tokens,
-                             "response_mime_type": "text/plain",
-                             }
-        else:
-            generation_config = {"temperature": temperature,
-                             "top_p": 0.95,
-                             "top_k": 64,
-                             "max_output_tokens": max_tokens,
-                             "response_mime_type": "text/plain",
-                             }
-        
-        if system_prompt:
-            model_google = genai.GenerativeModel(
-                model_name=GOOGLE_MODELS_DICT[model],
-                safety_settings=SAFETY_SETTINGS,
-                generation_config=generation_config,
-                system_instruction=system_prompt,
-            )
-        else:
-            model_google = genai.GenerativeModel(
-                model_name=GOOGLE_MODELS_DICT[model],
-                safety_settings=SAFETY_SETTINGS,
-                generation_config=generation_config,
-            )
-
-        history = [{"role": "user", "parts": files,},]
-
-        chat_session = model_google.start_chat(history=history)
-
-        response = chat_session.send_message(prompt)
+        model_google = _get_google_model(model, system_prompt, temperature, max_tokens)
+
+        response = model_google.generate_content(_multimodal_contents(files, prompt))
 
         return response.text
     except Exception as e:
         logger.exception(f"Failed to get response from model '{model}'")
         raise RuntimeError(f"Failed to get response from model '{model}': {e}")
-    
+
+
+async def get_response_from_google_models_async(model: str,
+                                                prompt: str,
+                                                system_prompt: str = None,
+                                                temperature: float = 0,
+                                                max_tokens: int = 4096) -> str:
+    """Async version of get_response_from_google_models, with at most PROVIDER_CONCURRENCY_LIMITS[GOOGLE_PROVIDER]
+    requests in flight.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails.
+    """
+
+    if model not in GOOGLE_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in GOOGLE_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in GOOGLE_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        model_google = _get_google_model(model, system_prompt, temperature, max_tokens)
+
+        async with provider_semaphore(GOOGLE_PROVIDER):
+            response = await model_google.generate_content_async(prompt)
+
+        return response.text
+    except Exception as e:
+        logger.exception(f"Failed to get response from model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+
+async def get_response_for_multimodal_prompts_async(model: str,
+                                                    files: list,
+                                                    prompt: str,
+                                                    system_prompt: str = None,
+                                                    temperature: float = 0,
+                                                    max_tokens: int = 4096) -> str:
+    """Async version of get_response_for_multimodal_prompts, with at most
+    PROVIDER_CONCURRENCY_LIMITS[GOOGLE_PROVIDER] requests in flight.
+
+    Args:
+        model (str): The name of the model to use.
+        files (list): The list of files that have been uploaded to google drive.
+        prompt (str): The prompt to send to the model.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails.
+    """
+
+    if model not in GOOGLE_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in GOOGLE_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in GOOGLE_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        model_google = _get_google_model(model, system_prompt, temperature, max_tokens)
+
+        async with provider_semaphore(GOOGLE_PROVIDER):
+            response = await model_google.generate_content_async(_multimodal_contents(files, prompt))
+
+        return response.text
+    except Exception as e:
+        logger.exception(f"Failed to get response from model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+
+def stream_response_from_google_models(model: str,
+                                       prompt: str,
+                                       system_prompt: str = None,
+                                       temperature: float = 0,
+                                       max_tokens: int = 4096) -> ResponseStream:
+    """Stream output from google models
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        ResponseStream: Iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in GOOGLE_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in GOOGLE_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in GOOGLE_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    def events():
+        try:
+            model_google = _get_google_model(model, system_prompt, temperature, max_tokens)
+
+            response = model_google.generate_content(prompt, stream=True)
+
+            usage = None
+            for chunk in response:
+                if chunk.parts:
+                    yield chunk.text
+                usage = chunk.usage_metadata or usage
+            if usage:
+                yield Usage(usage.prompt_token_count, usage.candidates_token_count)
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return ResponseStream(events())
+
+
+def stream_response_from_google_models_async(model: str,
+                                             prompt: str,
+                                             system_prompt: str = None,
+                                             temperature: float = 0,
+                                             max_tokens: int = 4096) -> AsyncResponseStream:
+    """Async version of stream_response_from_google_models, with at most
+    PROVIDER_CONCURRENCY_LIMITS[GOOGLE_PROVIDER] streams open at a time.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        AsyncResponseStream: Async iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in GOOGLE_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in GOOGLE_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in GOOGLE_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    async def events():
+        try:
+            model_google = _get_google_model(model, system_prompt, temperature, max_tokens)
+
+            usage = None
+            async with provider_semaphore(GOOGLE_PROVIDER):
+                response = await model_google.generate_content_async(prompt, stream=True)
+                async for chunk in response:
+                    if chunk.parts:
+                        yield chunk.text
+                    usage = chunk.usage_metadata or usage
+            if usage:
+                yield Usage(usage.prompt_token_count, usage.candidates_token_count)
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return AsyncResponseStream(events())
+
+
+def get_responses_from_google_models(model: str,
+                                     prompts: list[str],
+                                     system_prompt: str = None,
+                                     temperature: float = 0,
+                                     max_tokens: int = 4096,
+                                     max_concurrency: int = DEFAULT_GOOGLE_CONCURRENCY) -> list[str]:
+    """Get outputs from google models for many prompts, sent concurrently through one shared model handle.
+
+    Args:
+        model (str): The name of the model to use.
+        prompts (list[str]): The prompts to send to the model.
+        system_prompt (str, optional): The system prompt to send with every prompt. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        max_concurrency (int, optional): The maximum number of requests in flight. Defaults to DEFAULT_GOOGLE_CONCURRENCY.
+    Returns:
+        list[str]: The generated response of every prompt, in input order.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If an API call fails.
+    """
+
+    if model not in GOOGLE_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in GOOGLE_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in GOOGLE_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    if not prompts:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts)))) as executor:
+        return list(executor.map(lambda prompt: get_response_from_google_models(model, prompt, system_prompt,
+                                                                                temperature, max_tokens), prompts))
+
+
+async def get_responses_from_google_models_async(model: str,
+                                                 prompts: list[str],
+                                                 system_prompt: str = None,
+                                                 temperature: float = 0,
+                                                 max_tokens: int = 4096) -> list[str]:
+    """Async version of get_responses_from_google_models. The requests in flight are bounded by
+    PROVIDER_CONCURRENCY_LIMITS[GOOGLE_PROVIDER].
+
+    Args:
+        model (str): The name of the model to use.
+        prompts (list[str]): The prompts to send to the model.
+        system_prompt (str, optional): The system prompt to send with every prompt. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+    Returns:
+        list[str]: The generated response of every prompt, in input order.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If an API call fails.
+    """
+    return await asyncio.gather(*[get_response_from_google_models_async(model, prompt, system_prompt, temperature,
+                                                                        max_tokens) for prompt in prompts])
+
+
+def get_response_from_google_models_with_cached_context(model: str,
+                                                        prompt: str,
+                                                        files: list = None,
+                                                        system_prompt: str = None,
+                                                        temperature: float = 0,
+                                                        max_tokens: int = 4096,
+                                                        context_cache: GeminiContextCache = None) -> CachedResponse:
+    """Get output from google models on top of a cached context holding the files and the system prompt.
+
+    The context is created on the first call and reused by the calls with the same model, files and system prompt
+    until it expires, so the provider does not reprocess it. Gemini only caches contexts above a minimum token count
+    and only for explicitly versioned models, e.g. gemini-1.5-pro-002.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        files (list, optional): The list of files that have been uploaded to google drive. Defaults to None.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        context_cache (GeminiContextCache, optional): The registry of cached contexts. Defaults to the process-wide
+            GEMINI_CONTEXT_CACHE.
+    Returns:
+        CachedResponse: The generated response and its usage, including the tokens written to and read from the cache.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails.
+    """
+
+    if model not in GOOGLE_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in GOOGLE_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in GOOGLE_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        context_cache = context_cache or GEMINI_CONTEXT_CACHE
+        handle, created_tokens = context_cache.get_or_create(GOOGLE_MODELS_DICT[model], files, system_prompt)
+        model_google = genai.GenerativeModel.from_cached_content(
+            cached_content=handle,
+            generation_config=_generation_config(model, temperature, max_tokens),
+            safety_settings=SAFETY_SETTINGS)
+
+        response = model_google.generate_content(prompt)
+
+        metadata = response.usage_metadata
+        cached_tokens = metadata.cached_content_token_count
+        usage = CacheUsage(input_tokens=metadata.prompt_token_count - cached_tokens,
+                           output_tokens=metadata.candidates_token_count,
+                           cache_creation_input_tokens=created_tokens,
+                           cache_read_input_tokens=cached_tokens)
+        PROMPT_CACHE_STATS.record(GOOGLE_PROVIDER, usage)
+        logger.debug(f"Context cache usage of model '{model}': {usage}")
+        return CachedResponse(response.text, usage)
+    except Exception as e:
+        logger.exception(f"Failed to get response from model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': {e}")
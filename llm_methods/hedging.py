@@ -0,0 +1,235 @@
+"""Hedged requests with cross-provider fallback, to cut the latency tail caused by provider stalls.
+
+A request first goes to the preferred provider of the model. If it has not completed after the hedge delay, the p95
+latency of that provider over its recent successful calls, a backup request goes to the next provider serving the
+model (e.g. Together for qwen2-72b-instruct on Fireworks), or to the same provider when only one serves it. A failed
+request is retried on the next provider after a jittered exponential backoff. The first successful response wins and
+the requests still in flight are cancelled. The whole call is bounded by a deadline.
+
+Requests are sent with llm_methods.llm_router.generate_async, so they are paced by the provider rate limits.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from llm_methods.llm_router import generate_async, providers_for_model, resolve_provider
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE_SECONDS = 120.0
+# Used as the hedge delay until a provider has MIN_LATENCY_SAMPLES successful calls.
+DEFAULT_HEDGE_DELAY_SECONDS = 10.0
+HEDGE_PERCENTILE = 95
+MIN_LATENCY_SAMPLES = 20
+LATENCY_WINDOW = 200
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 8.0
+
+
+class LatencyTracker:
+    """Thread-safe sliding window of the latencies of the successful calls of every provider."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._latencies: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, latency: float) -> None:
+        """Record the latency in seconds of a successful call."""
+        with self._lock:
+            self._latencies.setdefault(provider, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, provider: str, percentile: float = HEDGE_PERCENTILE) -> float | None:
+        """Return a percentile of the recorded latencies of a provider, or None with fewer than MIN_LATENCY_SAMPLES."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(provider, ()))
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+    def hedge_delay(self, provider: str) -> float:
+        """Return the time after which a request to a provider is hedged."""
+        delay = self.percentile(provider)
+        return DEFAULT_HEDGE_DELAY_SECONDS if delay is None else delay
+
+
+LATENCY_TRACKER = LatencyTracker()
+
+_BACKGROUND_LOOP = None
+_BACKGROUND_LOOP_LOCK = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop running the calls of generate_hedged, started in a daemon thread on first use.
+
+    The async clients of the config files keep their connection pools bound to the event loop they are first used in,
+    so all synchronous calls share this one long-lived loop instead of a new loop per call.
+    """
+    global _BACKGROUND_LOOP
+    with _BACKGROUND_LOOP_LOCK:
+        if _BACKGROUND_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="generate-hedged-loop", daemon=True).start()
+            _BACKGROUND_LOOP = loop
+        return _BACKGROUND_LOOP
+
+
+def backoff_delay(retry: int,
+                  base: float = DEFAULT_BACKOFF_SECONDS,
+                  maximum: float = MAX_BACKOFF_SECONDS) -> float:
+    """Return the full-jitter exponential backoff before the given retry, starting at 0."""
+    return random.uniform(0, min(maximum, base * 2 ** retry))
+
+
+async def generate_hedged_async(model: str,
+                                prompt: str,
+                                system_prompt: str = None,
+                                temperature: float = 0,
+                                max_tokens: int = 4096,
+                                provider: str | None = None,
+                                deadline: float = DEFAULT_DEADLINE_SECONDS,
+                                hedge_delay: float | None = None,
+                                max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                                latency_tracker: LatencyTracker = LATENCY_TRACKER) -> str:
+    """Get output from a model, hedging slow requests and falling back to other providers on failures.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        provider (str, optional): The provider of the first request. Defaults to the first provider serving the model.
+        deadline (float, optional): The maximum duration of the call in seconds. Defaults to DEFAULT_DEADLINE_SECONDS.
+        hedge_delay (float, optional): The time in seconds after which a backup request is sent. Defaults to the
+            p95 latency of the provider of the last request sent.
+        max_attempts (int, optional): The maximum number of requests sent, hedges and retries included.
+            Defaults to DEFAULT_MAX_ATTEMPTS.
+        latency_tracker (LatencyTracker, optional): The latency statistics used for the hedge delay and updated with
+            the successful calls. Defaults to the process-wide LATENCY_TRACKER.
+
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If all requests fail or the deadline is exceeded.
+    """
+    if max_attempts <= 0:
+        raise ValueError("max_attempts must be positive")
+    first_provider = resolve_provider(model, provider)
+    providers = providers_for_model(model)
+    start = providers.index(first_provider)
+    providers = providers[start:] + providers[:start]
+
+    async def attempt(provider: str, delay: float) -> str:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        request_start = None
+
+        def start_timer() -> None:
+            # Started once the rate limits allow the request, so that queueing does not count as latency.
+            nonlocal request_start
+            request_start = time.perf_counter()
+
+        response = await generate_async(model, prompt, system_prompt=system_prompt, temperature=temperature,
+                                        max_tokens=max_tokens, provider=provider, on_send=start_timer)
+        latency_tracker.record(provider, time.perf_counter() - request_start)
+        return response
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    end = started + deadline
+    pending = {}
+    num_attempts = 0
+    num_failures = 0
+    next_hedge = started
+    last_error = None
+
+    def launch(delay: float = 0) -> None:
+        nonlocal num_attempts, next_hedge
+        target = providers[num_attempts % len(providers)]
+        pending[asyncio.ensure_future(attempt(target, delay))] = target
+        num_attempts += 1
+        next_hedge = loop.time() + delay + (hedge_delay if hedge_delay is not None
+                                            else latency_tracker.hedge_delay(target))
+
+    launch()
+    try:
+        while pending:
+            now = loop.time()
+            if now >= end:
+                break
+            timeout = end - now
+            if num_attempts < max_attempts:
+                timeout = min(timeout, max(0.0, next_hedge - now))
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                target = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    if num_attempts > 1:
+                        logger.info(f"Request to model '{model}' answered by provider '{target}' "
+                                    f"after {num_attempts} attempts.")
+                    return task.result()
+                if not isinstance(error, RuntimeError):
+                    raise error
+                logger.warning(f"Request to model '{model}' on provider '{target}' failed: {error}")
+                last_error = error
+                if num_attempts < max_attempts:
+                    launch(backoff_delay(num_failures))
+                num_failures += 1
+            if not done and num_attempts < max_attempts and loop.time() >= next_hedge:
+                logger.info(f"Hedging request to model '{model}' after {loop.time() - started:.2f} s.")
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if pending:
+        logger.error(f"Deadline of {deadline} s exceeded for model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': deadline of {deadline} s exceeded")
+    raise RuntimeError(f"Failed to get response from model '{model}' after {num_attempts} attempts: {last_error}")
+
+
+def generate_hedged(model: str,
+                    prompt: str,
+                    system_prompt: str = None,
+                    temperature: float = 0,
+                    max_tokens: int = 4096,
+                    provider: str | None = None,
+                    deadline: float = DEFAULT_DEADLINE_SECONDS,
+                    hedge_delay: float | None = None,
+                    max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+    """Synchronous version of generate_hedged_async, which runs it in a shared background event loop and blocks until
+    it completes. In async code, await generate_hedged_async instead.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        provider (str, optional): The provider of the first request. Defaults to the first provider serving the model.
+        deadline (float, optional): The maximum duration of the call in seconds. Defaults to DEFAULT_DEADLINE_SECONDS.
+        hedge_delay (float, optional): The time in seconds after which a backup request is sent. Defaults to the
+            p95 latency of the provider of the last request sent.
+        max_attempts (int, optional): The maximum number of requests sent. Defaults to DEFAULT_MAX_ATTEMPTS.
+
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If all requests fail or the deadline is exceeded.
+    """
+    coroutine = generate_hedged_async(model, prompt, system_prompt=system_prompt, temperature=temperature,
+                                      max_tokens=max_tokens, provider=provider, deadline=deadline,
+                                      hedge_delay=hedge_delay, max_attempts=max_attempts)
+    return asyncio.run_coroutine_threadsafe(coroutine, _background_loop()).result()
@@ -0,0 +1,213 @@
+"""Single entry point for text generation across all providers.
+
+generate and generate_async resolve the provider of a model from the *_MODELS_DICT tables of the config files and
+pace the requests with the provider's RateLimiter from llm_methods.provider_limits. A request reserves one request and
+its estimated tokens (prompt and system prompt tokens counted with helper_methods.tokens, plus max_tokens, which is
+how providers count tokens per minute) and waits until both buckets allow it, so bursts are queued instead of running
+into 429 errors. Once the response is in, the output tokens reserved but not generated are returned to the tokens per
+minute bucket, so short responses do not hold back the following requests.
+
+Passing a ResponseCache serves repeated temperature 0 requests from the cache, and concurrent identical requests share
+one upstream call. Requests with a non-zero temperature are never cached.
+"""
+
+import functools
+import logging
+from typing import Callable
+
+from helper_methods.tokens import TokenCounter
+from llm_methods.anthropic_llms import get_response_from_anthropic_models, get_response_from_anthropic_models_async
+from llm_methods.config_files.anthropic_config import ANTHROPIC_MODELS_DICT
+from llm_methods.config_files.fireworks_config import FIREWORKS_MODELS_URL_DICT
+from llm_methods.config_files.google_config import GOOGLE_MODELS_DICT
+from llm_methods.config_files.openai_config import OPENAI_MODELS_DICT
+from llm_methods.config_files.together_config import TOGETHER_MODELS_URL_DICT
+from llm_methods.fireworks_llms import get_response_from_fireworks_models, get_response_from_fireworks_models_async
+from llm_methods.google_llms import get_response_from_google_models, get_response_from_google_models_async
+from llm_methods.openai_llms import get_response_from_openai_models, get_response_from_openai_models_async
+from llm_methods.provider_limits import (ANTHROPIC_PROVIDER, FIREWORKS_PROVIDER, GOOGLE_PROVIDER, OPENAI_PROVIDER,
+                                         PROVIDERS, TOGETHER_PROVIDER, provider_rate_limiter)
+from llm_methods.response_cache import ResponseCache, request_key
+from llm_methods.together_llms import get_response_from_together_models, get_response_from_together_models_async
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROVIDER_MODELS_DICTS = {
+    OPENAI_PROVIDER: OPENAI_MODELS_DICT,
+    ANTHROPIC_PROVIDER: ANTHROPIC_MODELS_DICT,
+    GOOGLE_PROVIDER: GOOGLE_MODELS_DICT,
+    TOGETHER_PROVIDER: TOGETHER_MODELS_URL_DICT,
+    FIREWORKS_PROVIDER: FIREWORKS_MODELS_URL_DICT,
+}
+
+_PROVIDER_CALLS = {
+    OPENAI_PROVIDER: get_response_from_openai_models,
+    ANTHROPIC_PROVIDER: get_response_from_anthropic_models,
+    GOOGLE_PROVIDER: get_response_from_google_models,
+    TOGETHER_PROVIDER: get_response_from_together_models,
+    FIREWORKS_PROVIDER: get_response_from_fireworks_models,
+}
+
+_ASYNC_PROVIDER_CALLS = {
+    OPENAI_PROVIDER: get_response_from_openai_models_async,
+    ANTHROPIC_PROVIDER: get_response_from_anthropic_models_async,
+    GOOGLE_PROVIDER: get_response_from_google_models_async,
+    TOGETHER_PROVIDER: get_response_from_together_models_async,
+    FIREWORKS_PROVIDER: get_response_from_fireworks_models_async,
+}
+
+
+def providers_for_model(model: str) -> list[str]:
+    """Return the providers serving a model, in the order of PROVIDERS."""
+    return [provider for provider in PROVIDERS if model in PROVIDER_MODELS_DICTS[provider]]
+
+
+def resolve_provider(model: str, provider: str | None = None) -> str:
+    """Return the provider to send a model's requests to.
+
+    Args:
+        model (str): The name of the model.
+        provider (str, optional): The preferred provider. Defaults to the first provider serving the model.
+    Returns:
+        str: The provider.
+    Raises:
+        ValueError: If no provider, or not the given provider, serves the model.
+    """
+    providers = providers_for_model(model)
+    if not providers:
+        logger.error(f"Model '{model}' not found in any of the *_MODELS_DICT tables.")
+        raise ValueError(f"Model '{model}' not found in any of the *_MODELS_DICT tables."
+                         f" Currently the model is not supported.")
+    if provider is None:
+        return providers[0]
+    if provider not in providers:
+        raise ValueError(f"Model '{model}' is not served by provider '{provider}'. It is served by {providers}.")
+    return provider
+
+
+@functools.lru_cache(maxsize=None)
+def _token_counter() -> TokenCounter:
+    return TokenCounter()
+
+
+def estimate_request_tokens(prompt: str, system_prompt: str = None, max_tokens: int = 4096) -> int:
+    """Estimate the tokens a request counts against a tokens per minute limit: its input tokens plus max_tokens.
+
+    The input is counted with the default encoding of helper_methods.tokens, which is close enough for pacing
+    for the models of the other providers too.
+    """
+    texts = [prompt, system_prompt] if system_prompt else [prompt]
+    return sum(_token_counter().count_tokens_batch(texts)) + max_tokens
+
+
+def _refund_unused_output_tokens(provider: str, response: str | None, max_tokens: int) -> None:
+    # The request reserved max_tokens output tokens; return the ones the response did not use. A failed request
+    # generated no output.
+    unused = max_tokens - (_token_counter().count_tokens(response) if response else 0)
+    if unused > 0:
+        provider_rate_limiter(provider).tokens.refund(unused)
+
+
+def _cache_key(provider: str, model: str, prompt: str, system_prompt: str | None, max_tokens: int) -> str:
+    # Only temperature 0 responses are cached, so the temperature is not part of the key.
+    return request_key(provider=provider, model=model, system_prompt=system_prompt, prompt=prompt,
+                       max_tokens=max_tokens)
+
+
+def generate(model: str,
+             prompt: str,
+             system_prompt: str = None,
+             temperature: float = 0,
+             max_tokens: int = 4096,
+             provider: str | None = None,
+             cache: ResponseCache | None = None) -> str:
+    """Get output from any supported model, waiting for the provider's rate limits before sending the request.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        provider (str, optional): The provider to use for models served by several providers. Defaults to the
+            first provider serving the model.
+        cache (ResponseCache, optional): Cache of temperature 0 responses, keyed by the provider, the model and all
+            request parameters. Defaults to None.
+
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails.
+    """
+    provider = resolve_provider(model, provider)
+
+    def send() -> str:
+        waited = provider_rate_limiter(provider).acquire(estimate_request_tokens(prompt, system_prompt, max_tokens))
+        if waited > 0:
+            logger.debug(f"Waited {waited:.2f} s for the rate limits of provider '{provider}'.")
+        response = None
+        try:
+            response = _PROVIDER_CALLS[provider](model, prompt, system_prompt=system_prompt, temperature=temperature,
+                                                 max_tokens=max_tokens)
+            return response
+        finally:
+            _refund_unused_output_tokens(provider, response, max_tokens)
+
+    if cache is None or temperature != 0:
+        return send()
+    return cache.get_or_compute(_cache_key(provider, model, prompt, system_prompt, max_tokens), send)
+
+
+async def generate_async(model: str,
+                         prompt: str,
+                         system_prompt: str = None,
+                         temperature: float = 0,
+                         max_tokens: int = 4096,
+                         provider: str | None = None,
+                         cache: ResponseCache | None = None,
+                         on_send: Callable[[], None] | None = None) -> str:
+    """Async version of generate. Waiting for the rate limits does not block the event loop.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        provider (str, optional): The provider to use for models served by several providers. Defaults to the
+            first provider serving the model.
+        cache (ResponseCache, optional): Cache of temperature 0 responses, keyed by the provider, the model and all
+            request parameters. Defaults to None.
+        on_send (Callable[[], None], optional): Called once the rate limits allow the request, right before it is
+            sent, e.g. to time the request without its queueing. Not called for responses served by the cache.
+
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails.
+    """
+    provider = resolve_provider(model, provider)
+
+    async def send() -> str:
+        waited = await provider_rate_limiter(provider).acquire_async(
+            estimate_request_tokens(prompt, system_prompt, max_tokens))
+        if waited > 0:
+            logger.debug(f"Waited {waited:.2f} s for the rate limits of provider '{provider}'.")
+        if on_send is not None:
+            on_send()
+        response = None
+        try:
+            response = await _ASYNC_PROVIDER_CALLS[provider](model, prompt, system_prompt=system_prompt,
+                                                             temperature=temperature, max_tokens=max_tokens)
+            return response
+        finally:
+            _refund_unused_output_tokens(provider, response, max_tokens)
+
+    if cache is None or temperature != 0:
+        return await send()
+    return await cache.get_or_compute_async(_cache_key(provider, model, prompt, system_prompt, max_tokens), send)
@@ -1,10 +1,25 @@
+import base64
 import logging
-from llm_methods.config_files.openai_config import (OPENAI_CLIENT, OPENAI_MODELS_DICT, OPENAI_EMBEDDING_MODELS_DICT)
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from llm_methods.chat_messages import chat_messages
+from llm_methods.config_files.openai_config import (OPENAI_CLIENT, ASYNC_OPENAI_CLIENT, OPENAI_MODELS_DICT,
+                                                    OPENAI_EMBEDDING_MODELS_DICT)
+from llm_methods.embedding_cache import EmbeddingCache, normalize_text
+from llm_methods.provider_limits import OPENAI_PROVIDER, provider_semaphore
+from llm_methods.streaming import (AsyncResponseStream, ResponseStream, chat_completion_events,
+                                  chat_completion_events_async)
+from rag_utils.batch_splitting import pack_batches
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The embeddings endpoint accepts at most 2048 inputs and 300k tokens per request.
+MAX_EMBEDDING_INPUTS_PER_REQUEST = 2048
+DEFAULT_EMBEDDING_BATCH_SIZE_IN_TOKENS = 250_000
+DEFAULT_EMBEDDING_CONCURRENCY = 8
+
 
 def get_response_from_openai_models(model: str,
                                     prompt: str,
@@ -34,13 +49,8 @@ def get_response_from_openai_models(model: str,
                          f" Currently the model is not supported.")
 
     try:
-        messages = []
-
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
+        messages = chat_messages(prompt, system_prompt)
 
-        messages.append({"role": "user", "content": prompt})
-        
         response = OPENAI_CLIENT.chat.completions.create(
             model=OPENAI_MODELS_DICT[model],
             messages=messages,
@@ -56,15 +66,32 @@ def get_response_from_openai_models(model: str,
         logger.exception(f"Failed to get response from model '{model}'")
         raise RuntimeError(f"Failed to get response from model '{model}': {e}")
 
-def get_openai_embedding(text: str, model: str = "text-embedding-3-small") -> list[float]:
+def _create_embeddings(texts: list[str], model: str) -> list[np.ndarray]:
+    """Embed already normalized texts in one request, transferring the embeddings base64-encoded.
+
+    The base64 payload is the raw little-endian float32 bytes of every embedding, which decode straight into NumPy
+    arrays instead of going through a JSON list of floats.
+    """
+    response = OPENAI_CLIENT.embeddings.create(input=texts, model=model, encoding_format="base64")
+    return [np.frombuffer(base64.b64decode(item.embedding), dtype="<f4")
+            for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def get_openai_embedding(text: str,
+                         model: str = "text-embedding-3-small",
+                         cache: EmbeddingCache | None = None,
+                         as_numpy: bool = False) -> list[float] | np.ndarray:
     """Get embedding from openai models
 
     Args:
         text (str): The text to get embedding from.
         model (str, optional): The name of the model to use. Defaults to "text-embedding-3-small".
+        cache (EmbeddingCache, optional): Persistent cache which is checked before calling the API and filled
+            afterwards. Defaults to None.
+        as_numpy (bool, optional): Return a float32 NumPy array instead of a list of floats. Defaults to False.
 
     Returns:
-        list[float]: The embedding from the model.
+        list[float] | np.ndarray: The embedding from the model.
 
     Raises:
         ValueError: If the model is not found or the response structure is invalid.
@@ -75,8 +102,255 @@ def get_openai_embedding(text: str, model: str = "text-embedding-3-small") -> li
             logger.error(f"Model '{model}' not found in OPENAI_EMBEDDING_MODELS_DICT.")
             raise ValueError(f"Model '{model}' not found in OPENAI_EMBEDDING_MODELS_DICT."
                          f" Currently the model is not supported.")
-        text = text.replace("\n", " ")
-        return OPENAI_CLIENT.embeddings.create(input = [text], model=model).data[0].embedding
+        embedding = cache.get(model, text) if cache is not None else None
+        if embedding is None:
+            embedding = _create_embeddings([normalize_text(text)], model)[0]
+            if cache is not None:
+                cache.put(model, text, embedding)
+        return embedding if as_numpy else embedding.tolist()
+    except Exception as e:
+        logger.exception(f"Failed to get embedding from model '{model}'")
+        raise RuntimeError(f"Failed to get embedding from model '{model}': {e}")
+
+
+def get_openai_embeddings(texts: list[str],
+                          model: str = "text-embedding-3-small",
+                          batch_size_in_tokens: int = DEFAULT_EMBEDDING_BATCH_SIZE_IN_TOKENS,
+                          max_concurrency: int = DEFAULT_EMBEDDING_CONCURRENCY,
+                          cache: EmbeddingCache | None = None,
+                          as_numpy: bool = False) -> list[list[float]] | np.ndarray:
+    """Get embeddings for many texts from openai models
+
+    Duplicate texts are embedded once, and the unique texts are grouped into token-budgeted requests with
+    rag_utils.batch_splitting.pack_batches which are sent concurrently.
+
+    Args:
+        texts (list[str]): The texts to get embeddings from.
+        model (str, optional): The name of the model to use. Defaults to "text-embedding-3-small".
+        batch_size_in_tokens (int, optional): The maximum number of tokens per request.
+            Defaults to DEFAULT_EMBEDDING_BATCH_SIZE_IN_TOKENS.
+        max_concurrency (int, optional): The maximum number of requests in flight. Defaults to DEFAULT_EMBEDDING_CONCURRENCY.
+        cache (EmbeddingCache, optional): Persistent cache which is checked before calling the API and filled
+            afterwards. Defaults to None.
+        as_numpy (bool, optional): Return a single (len(texts), dim) float32 matrix instead of lists of floats.
+            Defaults to False.
+
+    Returns:
+        list[list[float]] | np.ndarray: The embedding of every text, in input order.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If an API call fails.
+    """
+    if model not in OPENAI_EMBEDDING_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in OPENAI_EMBEDDING_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in OPENAI_EMBEDDING_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        unique_texts = list(dict.fromkeys(normalize_text(text) for text in texts))
+        embeddings = {}
+        if cache is not None:
+            for text, embedding in zip(unique_texts, cache.get_many(model, unique_texts)):
+                if embedding is not None:
+                    embeddings[text] = embedding
+        missing_texts = [text for text in unique_texts if text not in embeddings]
+
+        requests = []
+        for batch in pack_batches(missing_texts, batch_size_in_tokens):
+            for start in range(0, len(batch.texts), MAX_EMBEDDING_INPUTS_PER_REQUEST):
+                requests.append(batch.texts[start:start + MAX_EMBEDDING_INPUTS_PER_REQUEST])
+
+        if requests:
+            logger.info(f"Embedding {len(missing_texts)} unique texts out of {len(texts)} in {len(requests)} requests.")
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(requests)))) as executor:
+                request_results = executor.map(lambda request_texts: _create_embeddings(request_texts, model), requests)
+                for request_texts, request_embeddings in zip(requests, request_results):
+                    embeddings.update(zip(request_texts, request_embeddings))
+                    if cache is not None:
+                        cache.put_many(model, request_texts, request_embeddings)
+
+        ordered = [embeddings[normalize_text(text)] for text in texts]
+        if as_numpy:
+            return np.stack(ordered) if ordered else np.empty((0, 0), dtype=np.float32)
+        return [embedding.tolist() for embedding in ordered]
+    except Exception as e:
+        logger.exception(f"Failed to get embeddings from model '{model}'")
+        raise RuntimeError(f"Failed to get embeddings from model '{model}': {e}")
+
+
+async def get_response_from_openai_models_async(model: str,
+                                                prompt: str,
+                                                system_prompt: str = None,
+                                                temperature: float = 0,
+                                                max_tokens: int = 4096) -> str:
+    """Async version of get_response_from_openai_models, using the shared async client and at most
+    PROVIDER_CONCURRENCY_LIMITS[OPENAI_PROVIDER] requests in flight.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found or the response structure is invalid.
+        RuntimeError: If the API call fails.
+    """
+
+    if model not in OPENAI_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in OPENAI_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in OPENAI_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        async with provider_semaphore(OPENAI_PROVIDER):
+            response = await ASYNC_OPENAI_CLIENT.chat.completions.create(
+                model=OPENAI_MODELS_DICT[model],
+                messages=chat_messages(prompt, system_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens)
+
+        if not response.choices or not response.choices[0].message:
+            logger.error("Invalid response structure received from the model")
+            raise ValueError("Invalid response structure received from the model")
+
+        return response.choices[0].message.content
+    except Exception as e:
+        logger.exception(f"Failed to get response from model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+
+async def get_openai_embedding_async(text: str,
+                                     model: str = "text-embedding-3-small",
+                                     cache: EmbeddingCache | None = None,
+                                     as_numpy: bool = False) -> list[float] | np.ndarray:
+    """Async version of get_openai_embedding, using the shared async client and at most
+    PROVIDER_CONCURRENCY_LIMITS[OPENAI_PROVIDER] requests in flight.
+
+    Args:
+        text (str): The text to get embedding from.
+        model (str, optional): The name of the model to use. Defaults to "text-embedding-3-small".
+        cache (EmbeddingCache, optional): Persistent cache which is checked before calling the API and filled
+            afterwards. Defaults to None.
+        as_numpy (bool, optional): Return a float32 NumPy array instead of a list of floats. Defaults to False.
+
+    Returns:
+        list[float] | np.ndarray: The embedding from the model.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails.
+    """
+    try:
+        if model not in OPENAI_EMBEDDING_MODELS_DICT:
+            logger.error(f"Model '{model}' not found in OPENAI_EMBEDDING_MODELS_DICT.")
+            raise ValueError(f"Model '{model}' not found in OPENAI_EMBEDDING_MODELS_DICT."
+                         f" Currently the model is not supported.")
+        embedding = cache.get(model, text) if cache is not None else None
+        if embedding is None:
+            async with provider_semaphore(OPENAI_PROVIDER):
+                response = await ASYNC_OPENAI_CLIENT.embeddings.create(input=[normalize_text(text)], model=model,
+                                                                       encoding_format="base64")
+            embedding = np.frombuffer(base64.b64decode(response.data[0].embedding), dtype="<f4")
+            if cache is not None:
+                cache.put(model, text, embedding)
+        return embedding if as_numpy else embedding.tolist()
     except Exception as e:
         logger.exception(f"Failed to get embedding from model '{model}'")
-        raise RuntimeError(f"Failed to get embedding from model '{model}': {e}")    
+        raise RuntimeError(f"Failed to get embedding from model '{model}': {e}")
+
+
+def stream_response_from_openai_models(model: str,
+                                       prompt: str,
+                                       system_prompt: str = None,
+                                       temperature: float = 0,
+                                       max_tokens: int = 4096) -> ResponseStream:
+    """Stream output from openai models
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        ResponseStream: Iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in OPENAI_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in OPENAI_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in OPENAI_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    def events():
+        try:
+            response = OPENAI_CLIENT.chat.completions.create(
+                model=OPENAI_MODELS_DICT[model],
+                messages=chat_messages(prompt, system_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True})
+            yield from chat_completion_events(response)
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return ResponseStream(events())
+
+
+def stream_response_from_openai_models_async(model: str,
+                                             prompt: str,
+                                             system_prompt: str = None,
+                                             temperature: float = 0,
+                                             max_tokens: int = 4096) -> AsyncResponseStream:
+    """Async version of stream_response_from_openai_models, with at most
+    PROVIDER_CONCURRENCY_LIMITS[OPENAI_PROVIDER] streams open at a time.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        AsyncResponseStream: Async iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in OPENAI_MODELS_DICT:
+        logger.error(f"Model '{model}' not found in OPENAI_MODELS_DICT.")
+        raise ValueError(f"Model '{model}' not found in OPENAI_MODELS_DICT."
+                         f" Currently the model is not supported.")
+
+    async def events():
+        try:
+            async with provider_semaphore(OPENAI_PROVIDER):
+                response = await ASYNC_OPENAI_CLIENT.chat.completions.create(
+                    model=OPENAI_MODELS_DICT[model],
+                    messages=chat_messages(prompt, system_prompt),
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True})
+                async for event in chat_completion_events_async(response):
+                    yield event
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return AsyncResponseStream(events())
@@ -0,0 +1,200 @@
+"""Provider-side prompt and context caching for long, repeated prefixes.
+
+Anthropic caches prompt prefixes marked with cache_control for a few minutes, which makes calls with the same long
+system prompt or prompt prefix cheaper and faster; see
+anthropic_llms.get_response_from_anthropic_models_with_prompt_caching. Gemini caches explicitly created contexts
+(CachedContent, e.g. uploaded files and a system instruction) until their expiry time; GeminiContextCache keeps track of
+the created caches so that repeated calls reuse them, see google_llms.get_response_from_google_models_with_cached_context.
+
+Both return a CachedResponse whose usage reports the cached token counts, and the counts are accumulated per provider in
+PROMPT_CACHE_STATS.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple
+
+from google.generativeai import caching
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_CACHE_TTL_SECONDS = 3600
+# Cached contexts closer than this to their expiry are recreated instead of reused.
+EXPIRY_MARGIN_SECONDS = 60
+
+ANTHROPIC_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class CacheUsage(NamedTuple):
+    """Token usage of a call. input_tokens excludes the tokens written to or read from the cache."""
+    input_tokens: int
+    output_tokens: int
+    cache_creation_input_tokens: int
+    cache_read_input_tokens: int
+
+
+class CachedResponse(NamedTuple):
+    """The generated text of a call together with its token usage."""
+    text: str
+    usage: CacheUsage
+
+
+class PromptCacheStats:
+    """Thread-safe totals of the cache usage of every provider."""
+
+    def __init__(self):
+        self._totals: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, usage: CacheUsage) -> None:
+        with self._lock:
+            totals = self._totals.setdefault(provider, dict.fromkeys(CacheUsage._fields + ("calls",), 0))
+            for field, value in usage._asdict().items():
+                totals[field] += value
+            totals["calls"] += 1
+
+    def snapshot(self) -> dict[str, dict[str, int]]:
+        """Return the totals of every provider, including the number of calls."""
+        with self._lock:
+            return {provider: dict(totals) for provider, totals in self._totals.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+PROMPT_CACHE_STATS = PromptCacheStats()
+
+
+def _file_identifier(file) -> str:
+    # Uploaded files are identified by their name (files/...), inline parts by their content.
+    name = getattr(file, "name", None)
+    return name if isinstance(name, str) else repr(file)
+
+
+def context_key(model: str, files: list | None, system_prompt: str | None) -> str:
+    """Return the key of a cached context of a model, files and system prompt."""
+    payload = json.dumps([model, [_file_identifier(file) for file in files or []], system_prompt])
+    return hashlib.sha256(payload.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class GeminiContextCache:
+    """Registry of the Gemini cached contexts created by this project, keyed by model, files and system prompt.
+
+    The registry is kept in memory and, when a path is given, in a JSON file so that the cached contexts are reused
+    across processes until they expire.
+    """
+
+    def __init__(self, path: str | None = None, ttl_seconds: int = DEFAULT_CONTEXT_CACHE_TTL_SECONDS):
+        """
+        Args:
+            path (str, optional): The JSON file persisting the registry. Defaults to None, keeping it in memory only.
+            ttl_seconds (int, optional): The lifetime of the created contexts. Defaults to DEFAULT_CONTEXT_CACHE_TTL_SECONDS.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> {"name": cached content name, "expire_time": unix time, "token_count": cached tokens}
+        self._entries: dict[str, dict] = {}
+        self._handles: dict[str, caching.CachedContent] = {}
+        # key -> Future of the handle being fetched or created, so that concurrent misses make one context.
+        self._in_flight: dict[str, Future] = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self._entries = json.load(f)
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(temporary_path, self.path)
+
+    def get_or_create(self, model_name: str, files: list | None = None,
+                      system_prompt: str | None = None) -> tuple[caching.CachedContent, int]:
+        """Return the cached context of a model, files and system prompt, creating it when it is missing or about to
+        expire.
+
+        Args:
+            model_name (str): The Gemini model name, e.g. a value of GOOGLE_MODELS_DICT.
+            files (list, optional): The uploaded files or other parts to cache.
+            system_prompt (str, optional): The system instruction to cache.
+        Returns:
+            tuple[caching.CachedContent, int]: The cached context and the number of tokens written to the cache by
+                this call, 0 when an existing context is reused.
+        """
+        key = context_key(model_name, files, system_prompt)
+        # The lock only guards the registry; the provider calls run outside it, one per key at a time.
+        with self._lock:
+            entry = self._entries.get(key)
+            reusable = entry is not None and entry["expire_time"] - EXPIRY_MARGIN_SECONDS > time.time()
+            if reusable and key in self._handles:
+                return self._handles[key], 0
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            return future.result(), 0
+
+        try:
+            if reusable:
+                handle = caching.CachedContent.get(entry["name"])
+                token_count = 0
+            else:
+                optional_parameters = {"system_instruction": system_prompt} if system_prompt else {}
+                contents = [{"role": "user", "parts": files}] if files else None
+                handle = caching.CachedContent.create(model=model_name, contents=contents,
+                                                      ttl=datetime.timedelta(seconds=self.ttl_seconds),
+                                                      **optional_parameters)
+                token_count = handle.usage_metadata.total_token_count
+            with self._lock:
+                self._handles[key] = handle
+                if not reusable:
+                    self._entries[key] = {"name": handle.name, "expire_time": handle.expire_time.timestamp(),
+                                          "token_count": token_count}
+                    self._save()
+            if not reusable:
+                logger.info(f"Created cached context '{handle.name}' of {token_count} tokens for model "
+                            f"'{model_name}'.")
+            future.set_result(handle)
+            return handle, token_count
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def purge_expired(self) -> None:
+        """Forget the contexts which have expired."""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry["expire_time"] <= now]:
+                del self._entries[key]
+                self._handles.pop(key, None)
+            self._save()
+
+    def clear(self) -> None:
+        """Delete all registered contexts on the provider side and forget them."""
+        with self._lock:
+            for key, entry in self._entries.items():
+                try:
+                    (self._handles.get(key) or caching.CachedContent.get(entry["name"])).delete()
+                except Exception:
+                    logger.warning(f"Could not delete cached context '{entry['name']}'.")
+            self._entries.clear()
+            self._handles.clear()
+            self._save()
+
+
+GEMINI_CONTEXT_CACHE = GeminiContextCache(path=os.environ.get("GEMINI_CONTEXT_CACHE_PATH"))
+
@@ -0,0 +1,185 @@
+"""Provider names, per-provider concurrency limits for the async provider calls and per-provider rate limits.
+
+Every async provider call holds a slot of its provider's asyncio.Semaphore while the request is in flight, so fanning
+out many prompts queues them in the event loop instead of flooding the provider. The limits default to
+DEFAULT_MAX_CONCURRENCY and can be set with the <PROVIDER>_MAX_CONCURRENCY environment variables, e.g.
+OPENAI_MAX_CONCURRENCY=32, or with set_provider_concurrency.
+
+Requests sent through llm_methods.llm_router are additionally paced by a RateLimiter per provider, with token buckets
+for requests per minute and tokens per minute. The limits default to DEFAULT_REQUESTS_PER_MINUTE and
+DEFAULT_TOKENS_PER_MINUTE and can be set with the <PROVIDER>_RPM and <PROVIDER>_TPM environment variables or with
+set_provider_rate_limits. The output tokens of a request reserved but not generated are refunded by the router
+once the response is in.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OPENAI_PROVIDER = "openai"
+ANTHROPIC_PROVIDER = "anthropic"
+GOOGLE_PROVIDER = "google"
+TOGETHER_PROVIDER = "together"
+FIREWORKS_PROVIDER = "fireworks"
+PROVIDERS = (OPENAI_PROVIDER, ANTHROPIC_PROVIDER, GOOGLE_PROVIDER, TOGETHER_PROVIDER, FIREWORKS_PROVIDER)
+
+DEFAULT_MAX_CONCURRENCY = 16
+# llm_methods.llm_router reserves the input tokens plus max_tokens for every request and returns the unused output
+# tokens once the response is in. Until then the reservations count in full: with the default max_tokens of 4096,
+# 200k tokens per minute admit at most about 48 requests per minute before the first responses come back, far below the
+# requests per minute limit. Set <PROVIDER>_TPM to the tier of the account, or pass a smaller max_tokens.
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+
+PROVIDER_CONCURRENCY_LIMITS = {
+    provider: int(os.environ.get(f"{provider.upper()}_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+    for provider in PROVIDERS
+}
+
+PROVIDER_RATE_LIMITS = {
+    provider: (int(os.environ.get(f"{provider.upper()}_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+               int(os.environ.get(f"{provider.upper()}_TPM", DEFAULT_TOKENS_PER_MINUTE)))
+    for provider in PROVIDERS
+}
+
+# asyncio primitives belong to one event loop, so the semaphores are kept per loop.
+_SEMAPHORES: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def set_provider_concurrency(provider: str, limit: int) -> None:
+    """Set the maximum number of in-flight async requests of a provider. Applies to event loops created afterwards
+    and to loops which have not called the provider yet.
+
+    Args:
+        provider (str): One of PROVIDERS.
+        limit (int): The maximum number of in-flight requests.
+    Raises:
+        ValueError: If the provider is unknown or the limit is not positive.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown provider '{provider}'. Supported providers are {PROVIDERS}.")
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    PROVIDER_CONCURRENCY_LIMITS[provider] = limit
+
+
+def provider_semaphore(provider: str) -> asyncio.Semaphore:
+    """Return the semaphore limiting the in-flight requests of a provider in the running event loop."""
+    semaphores = _SEMAPHORES.setdefault(asyncio.get_running_loop(), {})
+    if provider not in semaphores:
+        semaphores[provider] = asyncio.Semaphore(PROVIDER_CONCURRENCY_LIMITS[provider])
+    return semaphores[provider]
+
+
+class TokenBucket:
+    """Thread-safe token bucket which hands out reservations instead of rejecting requests.
+
+    A reservation is always granted and may drive the level negative; the caller then waits until the bucket has
+    refilled to zero. Later reservations queue behind the debt of earlier ones, so waiting callers are served in
+    reservation order.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        Args:
+            capacity (float): The maximum level of the bucket, i.e. the allowed burst.
+            refill_per_second (float): The refill rate.
+        """
+        if capacity <= 0 or refill_per_second <= 0:
+            raise ValueError("capacity and refill_per_second must be positive")
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take amount from the bucket and return the number of seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.refill_per_second)
+            self._updated = now
+            self._level -= amount
+            return max(0.0, -self._level / self.refill_per_second)
+
+    def refund(self, amount: float) -> None:
+        """Return an unused reservation to the bucket."""
+        with self._lock:
+            self._level = min(self.capacity, self._level + amount)
+
+
+class RateLimiter:
+    """Paces requests to stay within a requests per minute and a tokens per minute limit."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        """
+        Args:
+            requests_per_minute (int): The maximum number of requests per minute.
+            tokens_per_minute (int): The maximum number of tokens per minute.
+        """
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+
+    def reserve(self, num_tokens: int) -> float:
+        """Reserve one request and num_tokens tokens and return the number of seconds to wait before sending."""
+        return max(self.requests.reserve(1), self.tokens.reserve(num_tokens))
+
+    def refund(self, num_tokens: int) -> None:
+        """Return a reservation of a request which was not sent."""
+        self.requests.refund(1)
+        self.tokens.refund(num_tokens)
+
+    def acquire(self, num_tokens: int) -> float:
+        """Block until a request of num_tokens tokens may be sent. Returns the number of seconds waited."""
+        delay = self.reserve(num_tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, num_tokens: int) -> float:
+        """Wait in the event loop until a request of num_tokens tokens may be sent. Returns the number of seconds
+        waited."""
+        delay = self.reserve(num_tokens)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.refund(num_tokens)
+                raise
+        return delay
+
+
+_RATE_LIMITERS: dict[str, RateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def set_provider_rate_limits(provider: str, requests_per_minute: int, tokens_per_minute: int) -> None:
+    """Set the requests per minute and tokens per minute limits of a provider, replacing its rate limiter.
+
+    Args:
+        provider (str): One of PROVIDERS.
+        requests_per_minute (int): The maximum number of requests per minute.
+        tokens_per_minute (int): The maximum number of tokens per minute.
+    Raises:
+        ValueError: If the provider is unknown or a limit is not positive.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown provider '{provider}'. Supported providers are {PROVIDERS}.")
+    if requests_per_minute <= 0 or tokens_per_minute <= 0:
+        raise ValueError("requests_per_minute and tokens_per_minute must be positive")
+    with _RATE_LIMITERS_LOCK:
+        PROVIDER_RATE_LIMITS[provider] = (requests_per_minute, tokens_per_minute)
+        _RATE_LIMITERS.pop(provider, None)
+
+
+def provider_rate_limiter(provider: str) -> RateLimiter:
+    """Return the rate limiter of a provider, shared by all threads and event loops of the process."""
+    with _RATE_LIMITERS_LOCK:
+        if provider not in _RATE_LIMITERS:
+            _RATE_LIMITERS[provider] = RateLimiter(*PROVIDER_RATE_LIMITS[provider])
+        return _RATE_LIMITERS[provider]
@@ -0,0 +1,218 @@
+"""Opt-in cache of deterministic (temperature 0) LLM responses.
+
+Responses are keyed by the sha256 of the full request parameters. The cache has an in-memory LRU tier and an optional
+SQLite tier on disk which survives re-runs; entries of both tiers expire after ttl_seconds. Concurrent identical
+requests are de-duplicated: the first caller computes the response and the others wait for its result, in threads with
+get_or_compute and in an event loop with get_or_compute_async.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def request_key(**params) -> str:
+    """Return the cache key of a request, e.g. request_key(provider=..., model=..., prompt=..., max_tokens=...)."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8", "surrogatepass")
+                          ).hexdigest()
+
+
+class ResponseCache:
+    """LRU cache of responses in memory with an optional SQLite tier, shared safely between threads."""
+
+    def __init__(self,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 path: str | None = None,
+                 ttl_seconds: float | None = DEFAULT_TTL_SECONDS):
+        """
+        Args:
+            max_entries (int, optional): The maximum number of responses kept in memory. Defaults to DEFAULT_MAX_ENTRIES.
+            path (str, optional): The path of the SQLite database of the disk tier, created when it does not exist.
+                Defaults to None, keeping responses in memory only.
+            ttl_seconds (float, optional): The lifetime of an entry. None keeps entries forever.
+                Defaults to DEFAULT_TTL_SECONDS.
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        # asyncio futures belong to one event loop, so the in-flight requests of coroutines are kept per loop.
+        self._async_in_flight: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._connection = None
+        if path is not None:
+            self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                            key TEXT PRIMARY KEY,
+                                            response TEXT NOT NULL,
+                                            expires_at REAL NOT NULL)""")
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _expires_at(self) -> float:
+        return time.time() + self.ttl_seconds if self.ttl_seconds is not None else float("inf")
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> str | None:
+        """Return the cached response of a request key without counting it; the caller holds the lock."""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._memory[key]
+            entry = None
+        if entry is None and self._connection is not None:
+            row = self._connection.execute("SELECT response, expires_at FROM responses WHERE key = ?",
+                                           (key,)).fetchone()
+            if row is not None and row[1] > now:
+                entry = row
+                self._remember(key, *row)
+        if entry is None:
+            return None
+        self._memory.move_to_end(key)
+        return entry[0]
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response of a request key, or None when it is not cached or expired."""
+        with self._lock:
+            response = self._lookup(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def put(self, key: str, response: str) -> None:
+        """Cache the response of a request key."""
+        expires_at = self._expires_at()
+        with self._lock:
+            self._remember(key, response, expires_at)
+            if self._connection is not None:
+                self._connection.execute("INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                                         (key, response, expires_at))
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """Return the cached response of a request key, or compute and cache it.
+
+        Concurrent calls with the same key share one computation; its exception, if any, is raised in every caller
+        and nothing is cached. A None response is returned but not cached.
+
+        Args:
+            key (str): The request key, see request_key.
+            compute (Callable[[], str]): Sends the request.
+        Returns:
+            str: The response.
+        """
+        response = self.get(key)
+        if response is not None:
+            return response
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                # Another caller may have cached the response since the check above.
+                response = self._lookup(key)
+                if response is not None:
+                    return response
+                future = self._in_flight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            response = compute()
+            if response is not None:
+                self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def get_or_compute_async(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """Async version of get_or_compute: concurrent coroutines of one event loop with the same key share one
+        computation. A None response is returned but not cached.
+
+        Args:
+            key (str): The request key, see request_key.
+            compute (Callable[[], Awaitable[str]]): Sends the request.
+        Returns:
+            str: The response.
+        """
+        response = self.get(key)
+        if response is not None:
+            return response
+        in_flight = self._async_in_flight.setdefault(asyncio.get_running_loop(), {})
+        if key in in_flight:
+            # Shielded, so that a cancelled waiter does not cancel the shared request.
+            return await asyncio.shield(in_flight[key])
+        with self._lock:
+            # Another thread or event loop may have cached the response since the check above.
+            response = self._lookup(key)
+        if response is not None:
+            return response
+
+        async def run() -> str:
+            try:
+                result = await compute()
+                if result is not None:
+                    self.put(key, result)
+                return result
+            finally:
+                del in_flight[key]
+
+        task = in_flight[key] = asyncio.ensure_future(run())
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit and miss counters and the number of entries in memory."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._memory)}
+
+    def purge_expired(self) -> None:
+        """Delete the expired entries of both tiers."""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (_, expires_at) in self._memory.items() if expires_at <= now]:
+                del self._memory[key]
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+
+    def clear(self) -> None:
+        """Drop all entries of both tiers and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM responses")
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
@@ -0,0 +1,147 @@
+"""Streams of generated text with per-call latency statistics.
+
+The stream_response_from_* functions of the provider modules return a ResponseStream (or an AsyncResponseStream for the
+_async variants) which yields the text deltas as they arrive. Once the stream is exhausted, its stats hold the token
+usage reported by the provider, the time to first token and the generation speed in tokens per second:
+
+    stream = stream_response_from_openai_models("gpt-4o-mini", prompt)
+    for delta in stream:
+        print(delta, end="")
+    print(stream.stats.time_to_first_token, stream.stats.tokens_per_second)
+"""
+
+import time
+from typing import AsyncIterator, Iterator, NamedTuple
+
+from helper_methods.tokens import num_tokens_from_string
+
+
+class Usage(NamedTuple):
+    """Token usage reported by a provider at the end of a stream. Counts the provider does not report are None."""
+    input_tokens: int | None
+    output_tokens: int | None
+
+
+class StreamStats(NamedTuple):
+    """Usage and latency of a completed stream. Times are in seconds."""
+    input_tokens: int | None
+    output_tokens: int | None
+    time_to_first_token: float | None
+    total_time: float
+    tokens_per_second: float | None
+
+
+class _StreamRecorder:
+    """Accumulates the text and timings of a stream of text deltas and Usage events."""
+
+    def __init__(self):
+        self.chunks = []
+        self.usage = Usage(None, None)
+        self.stats = None
+        self._start = None
+        self._first_token = None
+
+    def start(self) -> None:
+        if self._start is None:
+            self._start = time.perf_counter()
+
+    def record(self, event: str | Usage) -> bool:
+        """Record an event and return whether it is a text delta."""
+        if isinstance(event, Usage):
+            self.usage = event
+            return False
+        if not event:
+            return False
+        if self._first_token is None:
+            self._first_token = time.perf_counter()
+        self.chunks.append(event)
+        return True
+
+    def finish(self) -> None:
+        end = time.perf_counter()
+        output_tokens = self.usage.output_tokens
+        if output_tokens is None and self.chunks:
+            output_tokens = num_tokens_from_string("".join(self.chunks))
+        time_to_first_token = None if self._first_token is None else self._first_token - self._start
+        generation_time = None if self._first_token is None else end - self._first_token
+        tokens_per_second = output_tokens / generation_time if output_tokens and generation_time else None
+        self.stats = StreamStats(self.usage.input_tokens, output_tokens, time_to_first_token, end - self._start,
+                                 tokens_per_second)
+
+
+class ResponseStream:
+    """Iterator over the text deltas of a response. text and stats are complete once the iteration has finished."""
+
+    def __init__(self, events: Iterator[str | Usage]):
+        self._events = events
+        self._recorder = _StreamRecorder()
+
+    @property
+    def text(self) -> str:
+        """The text received so far."""
+        return "".join(self._recorder.chunks)
+
+    @property
+    def stats(self) -> StreamStats | None:
+        """The usage and latency of the call, None until the stream is exhausted."""
+        return self._recorder.stats
+
+    def __iter__(self) -> Iterator[str]:
+        self._recorder.start()
+        for event in self._events:
+            if self._recorder.record(event):
+                yield event
+        self._recorder.finish()
+
+    def close(self) -> None:
+        """Stop the stream early, closing the underlying connection."""
+        self._events.close()
+
+
+class AsyncResponseStream:
+    """Async iterator over the text deltas of a response. text and stats are complete once the iteration has
+    finished."""
+
+    def __init__(self, events: AsyncIterator[str | Usage]):
+        self._events = events
+        self._recorder = _StreamRecorder()
+
+    @property
+    def text(self) -> str:
+        """The text received so far."""
+        return "".join(self._recorder.chunks)
+
+    @property
+    def stats(self) -> StreamStats | None:
+        """The usage and latency of the call, None until the stream is exhausted."""
+        return self._recorder.stats
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        self._recorder.start()
+        async for event in self._events:
+            if self._recorder.record(event):
+                yield event
+        self._recorder.finish()
+
+    async def aclose(self) -> None:
+        """Stop the stream early, closing the underlying connection."""
+        await self._events.aclose()
+
+
+def chat_completion_events(chunks) -> Iterator[str | Usage]:
+    """Convert the chunks of an OpenAI-compatible streamed chat completion (OpenAI, Together, Fireworks) to text
+    deltas and a final Usage."""
+    for chunk in chunks:
+        if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+        if getattr(chunk, "usage", None):
+            yield Usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+
+
+async def chat_completion_events_async(chunks) -> AsyncIterator[str | Usage]:
+    """Async version of chat_completion_events."""
+    async for chunk in chunks:
+        if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+        if getattr(chunk, "usage", None):
+            yield Usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
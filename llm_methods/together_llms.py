@@ -1,5 +1,10 @@
 import logging
-from llm_methods.config_files.together_config import (TOGETHER_CLIENT, TOGETHER_MODELS_URL_DICT, RERANK_MODELS_DICT)
+from llm_methods.chat_messages import chat_messages
+from llm_methods.config_files.together_config import (TOGETHER_CLIENT, ASYNC_TOGETHER_CLIENT, TOGETHER_MODELS_URL_DICT,
+                                                      RERANK_MODELS_DICT)
+from llm_methods.provider_limits import TOGETHER_PROVIDER, provider_semaphore
+from llm_methods.streaming import (AsyncResponseStream, ResponseStream, chat_completion_events,
+                                  chat_completion_events_async)
 
 
 logging.basicConfig(level=logging.INFO)
@@ -9,7 +14,8 @@ logger = logging.getLogger(__name__)
 def get_response_from_together_models(model: str,
                                       prompt: str,
                                       temperature: float = 0,
-                                      max_tokens: int = 4096) -> str:
+                                      max_tokens: int = 4096,
+                                      system_prompt: str = None) -> str:
     """Get output from together models
 
     Args:
@@ -17,6 +23,7 @@ def get_response_from_together_models(model: str,
         prompt (str): The prompt to send to the model.
         temperature (float, optional): Sampling temperature. Defaults to 0.
         max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
 
     Returns:
         str: The generated response from the model.
@@ -35,7 +42,7 @@ def get_response_from_together_models(model: str,
     try:
         response = TOGETHER_CLIENT.chat.completions.create(
             model=TOGETHER_MODELS_URL_DICT[model],
-            messages=[{"role": "user", "content": prompt, }],
+            messages=chat_messages(prompt, system_prompt),
             temperature=temperature,
             max_tokens=max_tokens)
 
@@ -89,3 +96,182 @@ def get_rerank_from_together_models(model: str,
     except Exception as e:
         logger.exception(f"Failed to get rerank from model '{model}'")
         raise RuntimeError(f"Failed to get rerank from model '{model}': {e}")
+
+
+async def get_response_from_together_models_async(model: str,
+                                                  prompt: str,
+                                                  temperature: float = 0,
+                                                  max_tokens: int = 4096,
+                                                  system_prompt: str = None) -> str:
+    """Async version of get_response_from_together_models, using the shared async client and at most
+    PROVIDER_CONCURRENCY_LIMITS[TOGETHER_PROVIDER] requests in flight.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+
+    Returns:
+        str: The generated response from the model.
+
+    Raises:
+        ValueError: If the model is not found or the response structure is invalid.
+        RuntimeError: If the API call fails.
+    """
+
+    if model not in TOGETHER_MODELS_URL_DICT:
+        logger.error(f"Model '{model}' not found in TOGETHER_MODELS_URL_DICT.")
+        raise ValueError(f"Model '{model}' not found in TOGETHER_MODELS_URL_DICT."
+                         f" Currently the model is not supported.")
+
+    try:
+        async with provider_semaphore(TOGETHER_PROVIDER):
+            response = await ASYNC_TOGETHER_CLIENT.chat.completions.create(
+                model=TOGETHER_MODELS_URL_DICT[model],
+                messages=chat_messages(prompt, system_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens)
+
+        if not response.choices or not response.choices[0].message:
+            logger.error("Invalid response structure received from the model")
+            raise ValueError("Invalid response structure received from the model")
+
+        return response.choices[0].message.content
+    except Exception as e:
+        logger.exception(f"Failed to get response from model '{model}'")
+        raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+
+async def get_rerank_from_together_models_async(model: str,
+                                                query: str,
+                                                documents: list[str],
+                                                top_n: int,
+                                                minimum_relevance_score: float = 0):
+    """
+    Async version of get_rerank_from_together_models, using the shared async client and at most
+    PROVIDER_CONCURRENCY_LIMITS[TOGETHER_PROVIDER] requests in flight.
+
+    Args:
+        model (str): The name of the reranking model to use.
+        query (str): The query to use for reranking documents.
+        documents (list[str]): A list of documents to be reranked.
+        top_n (int): The number of top-ranked documents to return.
+        minimum_relevance_score (float, optional): The minimum relevance score for a document to be included in the results. Defaults to 0.
+
+    Raises:
+        ValueError: If the specified model is not found in RERANK_MODELS_DICT.
+        RuntimeError: If the API call to the reranking model fails.
+    """
+    try:
+        if model not in RERANK_MODELS_DICT:
+            logger.error(f"Model '{model}' not found in RERANK_MODELS_DICT.")
+            raise ValueError(f"Model '{model}' not found in RERANK_MODELS_DICT."
+                             f" Currently the model is not supported.")
+
+        if not documents:
+            logger.error(f"There are no documents to re-rank.")
+            raise ValueError(f"documents cannot be empty")
+
+        async with provider_semaphore(TOGETHER_PROVIDER):
+            response = await ASYNC_TOGETHER_CLIENT.rerank.create(
+                model=RERANK_MODELS_DICT[model],
+                query=query,
+                documents=documents,
+                top_n=top_n
+            )
+
+        return [result for result in response.results if result.relevance_score > minimum_relevance_score]
+    except Exception as e:
+        logger.exception(f"Failed to get rerank from model '{model}'")
+        raise RuntimeError(f"Failed to get rerank from model '{model}': {e}")
+
+
+def stream_response_from_together_models(model: str,
+                                         prompt: str,
+                                         system_prompt: str = None,
+                                         temperature: float = 0,
+                                         max_tokens: int = 4096) -> ResponseStream:
+    """Stream output from together models
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        ResponseStream: Iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in TOGETHER_MODELS_URL_DICT:
+        logger.error(f"Model '{model}' not found in TOGETHER_MODELS_URL_DICT.")
+        raise ValueError(f"Model '{model}' not found in TOGETHER_MODELS_URL_DICT."
+                         f" Currently the model is not supported.")
+
+    def events():
+        try:
+            response = TOGETHER_CLIENT.chat.completions.create(
+                model=TOGETHER_MODELS_URL_DICT[model],
+                messages=chat_messages(prompt, system_prompt),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True)
+            yield from chat_completion_events(response)
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return ResponseStream(events())
+
+
+def stream_response_from_together_models_async(model: str,
+                                               prompt: str,
+                                               system_prompt: str = None,
+                                               temperature: float = 0,
+                                               max_tokens: int = 4096) -> AsyncResponseStream:
+    """Async version of stream_response_from_together_models, with at most
+    PROVIDER_CONCURRENCY_LIMITS[TOGETHER_PROVIDER] streams open at a time.
+
+    Args:
+        model (str): The name of the model to use.
+        prompt (str): The prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to None.
+        temperature (float, optional): Sampling temperature. Defaults to 0.
+        max_tokens (int, optional): Maximum number of tokens to generate. Defaults to 4096.
+
+    Returns:
+        AsyncResponseStream: Async iterator over the text deltas; its stats are set once it is exhausted.
+
+    Raises:
+        ValueError: If the model is not found.
+        RuntimeError: If the API call fails, raised while iterating.
+    """
+
+    if model not in TOGETHER_MODELS_URL_DICT:
+        logger.error(f"Model '{model}' not found in TOGETHER_MODELS_URL_DICT.")
+        raise ValueError(f"Model '{model}' not found in TOGETHER_MODELS_URL_DICT."
+                         f" Currently the model is not supported.")
+
+    async def events():
+        try:
+            async with provider_semaphore(TOGETHER_PROVIDER):
+                response = await ASYNC_TOGETHER_CLIENT.chat.completions.create(
+                    model=TOGETHER_MODELS_URL_DICT[model],
+                    messages=chat_messages(prompt, system_prompt),
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True)
+                async for event in chat_completion_events_async(response):
+                    yield event
+        except Exception as e:
+            logger.exception(f"Failed to get response from model '{model}'")
+            raise RuntimeError(f"Failed to get response from model '{model}': {e}")
+
+    return AsyncResponseStream(events())
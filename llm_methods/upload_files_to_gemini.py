@@ -1,5 +1,10 @@
+import hashlib
+import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
+from google.generativeai import protos
 import time
 import tempfile
 from dotenv import load_dotenv
@@ -14,6 +19,13 @@ genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_UPLOAD_CONCURRENCY = 8
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+# Cached files closer than this to their expiry are uploaded again, so that they outlive the requests using them.
+FILE_EXPIRY_MARGIN_SECONDS = 3600
+MIN_POLL_INTERVAL_SECONDS = 1
+MAX_POLL_INTERVAL_SECONDS = 10
+
 def upload_image_to_gemini(image_path: str):
     """Upload image to gemini
 
@@ -105,28 +117,209 @@ def upload_file_to_gemini(file_path: str, mime_type: str = None):
     logger.error(f"Error uploading file to gemini: {e}")
     return None
 
+class GeminiFileCache:
+  """Maps the sha256 of file contents to the Gemini file uploaded for them, until the remote file expires.
+
+  The cache is kept in memory and, when a path is given, in a JSON file so that it is shared across runs.
+  """
+
+  def __init__(self, path: str = None):
+    """
+    Args:
+      path (str, optional): The JSON file persisting the cache. Defaults to None, keeping it in memory only.
+    """
+    self.path = path
+    self._lock = threading.Lock()
+    # sha256 -> {"name", "uri", "mime_type", "expiration_time" (unix time)}
+    self._entries = {}
+    if path is not None and os.path.exists(path):
+      with open(path) as f:
+        self._entries = json.load(f)
+
+  def get(self, sha256: str):
+    """Return the active Gemini file uploaded for the contents, or None when it is missing or about to expire."""
+    with self._lock:
+      entry = self._entries.get(sha256)
+    if entry is None or entry["expiration_time"] - FILE_EXPIRY_MARGIN_SECONDS <= time.time():
+      return None
+    return genai.types.File(protos.File(name=entry["name"], uri=entry["uri"], mime_type=entry["mime_type"],
+                                        state=protos.File.State.ACTIVE))
+
+  def put(self, sha256: str, file) -> None:
+    """Remember the Gemini file uploaded for the contents."""
+    with self._lock:
+      self._entries[sha256] = {"name": file.name, "uri": file.uri, "mime_type": file.mime_type,
+                               "expiration_time": file.expiration_time.timestamp()}
+      now = time.time()
+      self._entries = {key: entry for key, entry in self._entries.items() if entry["expiration_time"] > now}
+      if self.path is not None:
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as f:
+          json.dump(self._entries, f)
+        os.replace(temporary_path, self.path)
+
+
+GEMINI_FILE_CACHE = GeminiFileCache(path=os.environ.get("GEMINI_FILE_CACHE_PATH"))
+
+
+def _is_url(source: str) -> bool:
+  return source.startswith(("http://", "https://"))
+
+
+def _fetch_and_hash(source: str) -> tuple[str, str, bool]:
+  """Return the local path and the sha256 of a file or URL. URLs are streamed to a temporary file, which is hashed
+  while it is written; the returned flag tells whether the path is such a temporary file."""
+  digest = hashlib.sha256()
+  if not _is_url(source):
+    with open(source, "rb") as f:
+      for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return source, digest.hexdigest(), False
+
+  suffix = os.path.splitext(source.split("?")[0])[1]
+  temp_path = None
+  completed = False
+  try:
+    with requests.get(source, stream=True) as response:
+      response.raise_for_status()
+      with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        temp_path = temp_file.name
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+          digest.update(chunk)
+          temp_file.write(chunk)
+    completed = True
+  finally:
+    # Do not leave a partial download behind.
+    if not completed and temp_path is not None and os.path.exists(temp_path):
+      os.remove(temp_path)
+  return temp_path, digest.hexdigest(), True
+
+
+def wait_for_files_to_be_active(files: list, max_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY) -> list:
+  """Waits until all given files are processed, polling the ones still processing together.
+
+  The poll interval starts at MIN_POLL_INTERVAL_SECONDS and doubles up to MAX_POLL_INTERVAL_SECONDS, so small files
+  are ready without a long fixed sleep.
+
+  Args:
+    files (list): file objects
+    max_concurrency (int): maximum number of concurrent status requests
+  Returns:
+    list: the refreshed file objects, None for the files which failed to process
+  """
+  files = list(files)
+  pending = [index for index, file in enumerate(files) if file is not None]
+  interval = MIN_POLL_INTERVAL_SECONDS
+
+  def get_file(index):
+    try:
+      return genai.get_file(files[index].name)
+    except Exception as e:
+      logger.error(f"Error waiting for file {files[index].name} to be active: {e}")
+      return None
+
+  with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending)))) as executor:
+    while pending:
+      for index, file in zip(pending, executor.map(get_file, pending)):
+        files[index] = file
+      still_processing = []
+      for index in pending:
+        if files[index] is None:
+          continue
+        state = files[index].state.name
+        if state == "PROCESSING":
+          still_processing.append(index)
+        elif state != "ACTIVE":
+          logger.error(f"File {files[index].name} failed to process")
+          files[index] = None
+      pending = still_processing
+      if pending:
+        time.sleep(interval)
+        interval = min(MAX_POLL_INTERVAL_SECONDS, interval * 2)
+  return files
+
+
+def upload_files_to_gemini(sources: list[str],
+                           mime_types: list[str] = None,
+                           max_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+                           cache: GeminiFileCache = None) -> list:
+  """Upload many local files or URLs to gemini concurrently and wait until they are active
+
+  URLs are streamed to disk instead of being buffered in memory. Files are identified by the sha256 of their
+  contents: contents uploaded before and not yet expired are taken from the cache without uploading them again, and
+  identical contents within the batch are uploaded once.
+
+  Args:
+    sources (list[str]): local paths or http(s) URLs of the files
+    mime_types (list[str], optional): mime type of every file, guessed from the file name when None
+    max_concurrency (int, optional): maximum number of concurrent downloads and uploads
+    cache (GeminiFileCache, optional): the sha256 to file cache, defaults to GEMINI_FILE_CACHE
+  Returns:
+    list: the active file object of every source, None for the sources which failed
+  """
+  cache = cache or GEMINI_FILE_CACHE
+  mime_types = mime_types or [None] * len(sources)
+  results = [None] * len(sources)
+  if not sources:
+    return results
+
+  def fetch(index):
+    try:
+      return _fetch_and_hash(sources[index])
+    except Exception as e:
+      logger.error(f"Error fetching '{sources[index]}': {e}")
+      return None
+
+  with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(sources)))) as executor:
+    fetched = list(executor.map(fetch, range(len(sources))))
+
+    # Upload every new content once, from the first source which has it.
+    to_upload = {}
+    for index, item in enumerate(fetched):
+      if item is None:
+        continue
+      cached = cache.get(item[1])
+      if cached is not None:
+        results[index] = cached
+      elif item[1] not in to_upload:
+        to_upload[item[1]] = index
+    if len(to_upload) < len(sources):
+      logger.info(f"Uploading {len(to_upload)} new files out of {len(sources)} sources.")
+
+    def upload(index):
+      return upload_file_to_gemini(fetched[index][0], mime_type=mime_types[index])
+
+    uploaded = dict(zip(to_upload, executor.map(upload, to_upload.values())))
+
+  for path, _, is_temporary in filter(None, fetched):
+    if is_temporary and os.path.exists(path):
+      os.remove(path)
+
+  active = dict(zip(uploaded, wait_for_files_to_be_active(uploaded.values(), max_concurrency)))
+  for sha256, file in active.items():
+    if file is not None:
+      cache.put(sha256, file)
+  for index, item in enumerate(fetched):
+    if item is not None and results[index] is None:
+      results[index] = active.get(item[1])
+  return results
+
+
 def upload_screenshot_to_gemini_from_supabase(screenshot_url: str):
   """Upload screenshot to gemini from supabase
 
+  The screenshot is streamed to disk and is not uploaded again while an upload of the same contents is cached.
+
   Args:
     screenshot_url (str): url of the screenshot
   Returns:
     file: file object
   """
   try:
-    response = requests.get(screenshot_url)
-    response.raise_for_status()
-    image_data = response.content
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-        temp_file.write(image_data)
-        temp_file_path = temp_file.name
-
-    file = upload_image_to_gemini(temp_file_path)
-    
-    wait_for_file_to_be_active(file)
-    
-    os.remove(temp_file_path)
-    
+    file = upload_files_to_gemini([screenshot_url], mime_types=["image/jpeg"])[0]
+    if file is None:
+      raise Exception(f"Could not upload {screenshot_url}")
+
     logger.info(f"Uploaded file '{file.display_name}' as: {file.uri}")
     return file
   except Exception as e:
@@ -4,8 +4,10 @@ We will use the cl100k_base encoding scheme to count the number of tokens in the
 with a maximum of BATCH_SIZE_IN_TOKENS.
 """
 
+import itertools
 import logging
-from helper_methods.tokens import num_tokens_from_string
+from typing import Iterable, Iterator, NamedTuple
+from helper_methods.tokens import count_tokens_batch
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,32 +15,153 @@ logger = logging.getLogger(__name__)
 
 ENCODING_NAME = "cl100k_base"
 
-def batch_splitter(texts: list[str], batch_size_in_tokens: int) -> list[list[str]]:
+# Packing strategies.
+GREEDY = "greedy"
+FIRST_FIT_DECREASING = "first_fit_decreasing"
+PACKING_STRATEGIES = (GREEDY, FIRST_FIT_DECREASING)
+
+# Number of texts read from the input and token-counted at a time by iter_batches.
+DEFAULT_READ_AHEAD = 1024
+
+
+class Batch(NamedTuple):
+    """A batch of texts together with their positions in the input.
+
+    A batch is flagged as oversized when it holds a single text which alone exceeds the token budget.
+    """
+    indices: list[int]
+    texts: list[str]
+    num_tokens: int
+    oversized: bool = False
+
+
+def _validate_batch_size(batch_size_in_tokens: int) -> None:
+    if batch_size_in_tokens <= 0:
+        raise ValueError("batch_size_in_tokens must be positive")
+
+
+def iter_batches(texts: Iterable[str],
+                 batch_size_in_tokens: int,
+                 read_ahead: int = DEFAULT_READ_AHEAD) -> Iterator[Batch]:
+    """Greedily pack texts into batches in arrival order, yielding every batch as soon as it is full.
+
+    Only read_ahead texts and the current batch are held in memory, so texts can be any iterator.
+    Texts which alone exceed the budget are yielded as their own batch flagged as oversized.
+
+    Args:
+        texts (Iterable[str]): The texts to split into batches.
+        batch_size_in_tokens (int): The maximum number of tokens in a batch.
+        read_ahead (int, optional): The number of texts token-counted at a time. Defaults to DEFAULT_READ_AHEAD.
+
+    Yields:
+        Batch: The batches of texts.
+    """
+    _validate_batch_size(batch_size_in_tokens)
+    if read_ahead <= 0:
+        raise ValueError("read_ahead must be positive")
+    iterator = iter(texts)
+    offset = 0
+    current_indices, current_texts, current_size = [], [], 0
+    while block := list(itertools.islice(iterator, read_ahead)):
+        token_counts = count_tokens_batch(block, encoding_name=ENCODING_NAME)
+        for index, text, num_tokens in zip(itertools.count(offset), block, token_counts):
+            if num_tokens > batch_size_in_tokens:
+                logger.warning(f"Text {index} has {num_tokens} tokens which exceeds the batch size of "
+                               f"{batch_size_in_tokens} tokens.")
+                # Close the current batch first, so that batches keep the input order.
+                if current_texts:
+                    yield Batch(current_indices, current_texts, current_size)
+                    current_indices, current_texts, current_size = [], [], 0
+                yield Batch([index], [text], num_tokens, oversized=True)
+                continue
+            if current_size + num_tokens > batch_size_in_tokens:
+                yield Batch(current_indices, current_texts, current_size)
+                current_indices, current_texts, current_size = [], [], 0
+            current_indices.append(index)
+            current_texts.append(text)
+            current_size += num_tokens
+        offset += len(block)
+    if current_texts:
+        yield Batch(current_indices, current_texts, current_size)
+
+
+def _first_fit_decreasing(texts: list[str], batch_size_in_tokens: int) -> list[Batch]:
+    """Pack texts with first-fit decreasing, which places every text, largest first, in the first batch with room."""
+    token_counts = count_tokens_batch(texts, encoding_name=ENCODING_NAME)
+    oversized = []
+    order = []
+    for index in sorted(range(len(texts)), key=token_counts.__getitem__, reverse=True):
+        if token_counts[index] > batch_size_in_tokens:
+            logger.warning(f"Text {index} has {token_counts[index]} tokens which exceeds the batch size of "
+                           f"{batch_size_in_tokens} tokens.")
+            oversized.append(Batch([index], [texts[index]], token_counts[index], oversized=True))
+        else:
+            order.append(index)
+
+    # Max segment tree over the remaining capacity of the batches, which finds the first batch with room in
+    # O(log n). Unopened batches have the full capacity.
+    num_leaves = 1
+    while num_leaves < max(len(order), 1):
+        num_leaves *= 2
+    tree = [batch_size_in_tokens] * (2 * num_leaves)
+    batches: list[list[int]] = []
+    for index in order:
+        num_tokens = token_counts[index]
+        node = 1
+        while node < num_leaves:
+            node = 2 * node if tree[2 * node] >= num_tokens else 2 * node + 1
+        leaf = node - num_leaves
+        if leaf == len(batches):
+            batches.append([])
+        batches[leaf].append(index)
+        tree[node] -= num_tokens
+        node //= 2
+        while node:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    packed = []
+    for indices in batches:
+        indices.sort()
+        packed.append(Batch(indices, [texts[i] for i in indices], sum(token_counts[i] for i in indices)))
+    return packed + oversized
+
+
+def pack_batches(texts: list[str], batch_size_in_tokens: int, strategy: str = GREEDY) -> list[Batch]:
+    """Split texts into batches of at most batch_size_in_tokens tokens.
+
+    The greedy strategy keeps arrival order, first_fit_decreasing minimizes the number of batches for texts of mixed
+    length. Every batch carries the original indices of its texts, so callers can restore the input order.
+    Texts which alone exceed the budget are returned as their own batch flagged as oversized.
+
+    Args:
+        texts (list[str]): A list of texts to split into batches.
+        batch_size_in_tokens (int): The maximum number of tokens in a batch.
+        strategy (str, optional): One of PACKING_STRATEGIES. Defaults to GREEDY.
+
+    Returns:
+        list[Batch]: The batches of texts.
+    """
+    _validate_batch_size(batch_size_in_tokens)
+    if strategy == GREEDY:
+        return list(iter_batches(texts, batch_size_in_tokens))
+    if strategy == FIRST_FIT_DECREASING:
+        return _first_fit_decreasing(texts, batch_size_in_tokens)
+    raise ValueError(f"Unknown packing strategy '{strategy}'. Supported strategies are {PACKING_STRATEGIES}.")
+
+
+def batch_splitter(texts: list[str], batch_size_in_tokens: int, strategy: str = GREEDY) -> list[list[str]]:
     """
     Args:
         texts (list[str]): A list of texts to split into batches.
         batch_size_in_tokens (int): The maximum number of tokens in a batch.
+        strategy (str, optional): One of PACKING_STRATEGIES. Defaults to GREEDY.
 
     Returns:
         list[list[str]]: A list of batches of texts.
     """
     try:
-        batches = []
-        current_batch = []
-        current_batch_size = 0
-        for text in texts:
-            num_tokens = num_tokens_from_string(text, encoding_name=ENCODING_NAME)
-            if current_batch_size + num_tokens <= batch_size_in_tokens:
-                current_batch.append(text)
-                current_batch_size += num_tokens
-            else:
-                if current_batch:
-                    batches.append(current_batch)
-                current_batch = [text]
-                current_batch_size = num_tokens
-        if current_batch:
-            batches.append(current_batch)
-        return batches
+        return [batch.texts for batch in pack_batches(texts, batch_size_in_tokens, strategy=strategy)]
     except Exception as e:
         logger.error(f"Error splitting batches: {e}")
-        return []   
+        return []
@@ -1,11 +1,20 @@
 """Methods for splitting text into chunks based on token count of cl100k_base encoding scheme."""
 
 import logging
-from tiktoken import get_encoding
+import re
+from collections import deque
+from typing import Iterator
+from tiktoken import Encoding, get_encoding
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DEFAULT_ENCODING_NAME = "cl100k_base"
+# Number of characters encoded at a time by the streaming splitter.
+DEFAULT_SEGMENT_SIZE_IN_CHARS = 64_000
+
+# A single space between two non-space characters. The encoding's pre-tokenizer always starts a new piece at such a
+# space, so cutting the text there produces the same tokens as encoding it in one go.
+_SEGMENT_BOUNDARY_PATTERN = re.compile(r"\S (?=\S)")
 
 #text splitting method which has two parameters, chunk_overlap and tokens_per_chunk
 def text_splitter(text: str, chunk_overlap: int, tokens_per_chunk: int) -> list[str]:
@@ -19,13 +28,8 @@ def text_splitter(text: str, chunk_overlap: int, tokens_per_chunk: int) -> list[
         list[str]: A list of chunks of text.
     """
     try:
-        if tokens_per_chunk <= 0:
-            raise ValueError("tokens_per_chunk must be positive")
-        if chunk_overlap < 0:
-            raise ValueError("chunk_overlap must be positive")
-        if chunk_overlap >= tokens_per_chunk:
-            raise ValueError("chunk_overlap must be less than tokens_per_chunk")
-        
+        _validate_chunk_parameters(chunk_overlap, tokens_per_chunk)
+
         encoding = get_encoding(DEFAULT_ENCODING_NAME)
         encoded_tokens = encoding.encode(text)
         chunks = []
@@ -36,4 +40,78 @@ def text_splitter(text: str, chunk_overlap: int, tokens_per_chunk: int) -> list[
     except Exception as e:
         logger.error(f"Error in split_text: {str(e)}")
         return []
-    
+
+
+def _validate_chunk_parameters(chunk_overlap: int, tokens_per_chunk: int) -> None:
+    if tokens_per_chunk <= 0:
+        raise ValueError("tokens_per_chunk must be positive")
+    if chunk_overlap < 0:
+        raise ValueError("chunk_overlap must be positive")
+    if chunk_overlap >= tokens_per_chunk:
+        raise ValueError("chunk_overlap must be less than tokens_per_chunk")
+
+
+def _iter_token_offsets(text: str, encoding: Encoding, segment_size: int) -> Iterator[int]:
+    """Yield the character offset at which every token of the text starts.
+
+    The text is encoded one segment at a time, so only the tokens of the current segment are held in memory.
+    """
+    segment_start = 0
+    while segment_start < len(text):
+        match = _SEGMENT_BOUNDARY_PATTERN.search(text, segment_start + segment_size)
+        segment_end = match.start() + 1 if match else len(text)
+        tokens = encoding.encode_ordinary(text[segment_start:segment_end])
+        _, offsets = encoding.decode_with_offsets(tokens)
+        for offset in offsets:
+            yield segment_start + offset
+        segment_start = segment_end
+
+
+def iter_text_chunks(text: str,
+                     chunk_overlap: int,
+                     tokens_per_chunk: int,
+                     return_offsets: bool = False,
+                     segment_size: int = DEFAULT_SEGMENT_SIZE_IN_CHARS) -> Iterator[str] | Iterator[tuple[int, int]]:
+    """Streaming version of text_splitter which yields the chunks as they are produced.
+
+    Chunks are cut at the same token positions as text_splitter, but they are sliced from the original text instead of
+    being decoded from tokens. Peak memory is bounded by the segment and chunk sizes, not by the document size.
+
+    Args:
+        text (str): The text to split into chunks.
+        chunk_overlap (int): The number of tokens to overlap between chunks.
+        tokens_per_chunk (int): The number of tokens per chunk.
+        return_offsets (bool, optional): Yield (start, end) character offsets into text instead of the chunk texts,
+            so that callers can slice lazily or store the offsets only. Defaults to False.
+        segment_size (int, optional): The number of characters encoded at a time.
+            Defaults to DEFAULT_SEGMENT_SIZE_IN_CHARS.
+
+    Yields:
+        str | tuple[int, int]: The chunks of text, or their (start, end) character offsets.
+    """
+    try:
+        _validate_chunk_parameters(chunk_overlap, tokens_per_chunk)
+        if segment_size <= 0:
+            raise ValueError("segment_size must be positive")
+        encoding = get_encoding(DEFAULT_ENCODING_NAME)
+    except Exception as e:
+        logger.error(f"Error in iter_text_chunks: {str(e)}")
+        return
+
+    step = tokens_per_chunk - chunk_overlap
+    # Start offsets of the tokens of the current chunk plus the first token after it, which marks the chunk end.
+    window = deque()
+    for offset in _iter_token_offsets(text, encoding, segment_size):
+        window.append(offset)
+        if len(window) == tokens_per_chunk + 1:
+            start, end = window[0], window[-1]
+            yield (start, end) if return_offsets else text[start:end]
+            for _ in range(step):
+                window.popleft()
+
+    # The remaining chunks run to the end of the text.
+    while window:
+        start, end = window[0], len(text)
+        yield (start, end) if return_offsets else text[start:end]
+        for _ in range(min(step, len(window))):
+            window.popleft()
@@ -0,0 +1,152 @@
+"""In-memory inverted index over the BM25 sparse embeddings produced by vector_db.generate_bm25_embedding.
+
+Posting lists are stored in CSR form: the postings of the term terms[i] are docs[offsets[i]:offsets[i + 1]] and
+weights[offsets[i]:offsets[i + 1]], sorted by internal document number. Queries are answered with MaxScore dynamic
+pruning: terms are processed in decreasing order of their score upper bound, and as soon as the upper bounds of the
+remaining terms cannot lift an unseen document into the top k, those terms are only looked up for the current
+candidates instead of being scanned in full.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+from helper_methods.similarities import top_k
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARRAY_NAMES = ("doc_ids", "terms", "offsets", "docs", "weights", "max_weights")
+
+
+class BM25Index:
+    """Inverted index of BM25 sparse embeddings with MaxScore top-k search."""
+
+    def __init__(self):
+        self.doc_ids = np.empty(0, dtype=np.int64)
+        self.terms = np.empty(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.docs = np.empty(0, dtype=np.int32)
+        self.weights = np.empty(0, dtype=np.float32)
+        self.max_weights = np.empty(0, dtype=np.float32)
+        self._pending_doc_ids = []
+        self._pending_postings = []
+
+    def __len__(self) -> int:
+        return len(self.doc_ids) + len(self._pending_doc_ids)
+
+    def add(self, doc_id: int, embedding) -> None:
+        """Add the sparse embedding of a document. The postings are merged into the index on the next search or save.
+
+        Args:
+            doc_id (int): The id of the document.
+            embedding: A fastembed SparseEmbedding, or any object with indices and values arrays.
+        """
+        internal_doc = len(self)
+        indices = np.asarray(embedding.indices, dtype=np.int64)
+        values = np.asarray(embedding.values, dtype=np.float32)
+        self._pending_doc_ids.append(doc_id)
+        self._pending_postings.append((indices, np.full(len(indices), internal_doc, dtype=np.int32), values))
+
+    def add_many(self, doc_ids, embeddings) -> None:
+        """Add the sparse embeddings of many documents."""
+        for doc_id, embedding in zip(doc_ids, embeddings):
+            self.add(doc_id, embedding)
+
+    def _merge_pending(self) -> None:
+        """Merge the pending postings into the CSR arrays."""
+        if not self._pending_doc_ids:
+            return
+        pending_terms, pending_docs, pending_weights = (np.concatenate(parts) for parts in zip(*self._pending_postings))
+        existing_terms = np.repeat(self.terms, np.diff(self.offsets))
+        terms = np.concatenate([existing_terms, pending_terms])
+        docs = np.concatenate([self.docs, pending_docs])
+        weights = np.concatenate([self.weights, pending_weights])
+
+        order = np.lexsort((docs, terms))
+        terms, self.docs, self.weights = terms[order], docs[order], weights[order]
+        self.terms, starts = np.unique(terms, return_index=True)
+        self.offsets = np.append(starts, len(terms)).astype(np.int64)
+        self.max_weights = (np.maximum.reduceat(self.weights, starts) if len(starts)
+                            else np.empty(0, dtype=np.float32))
+        self.doc_ids = np.concatenate([self.doc_ids, np.asarray(self._pending_doc_ids, dtype=np.int64)])
+        self._pending_doc_ids = []
+        self._pending_postings = []
+
+    def search(self, query_embedding, k: int = 10) -> list[tuple[int, float]]:
+        """Return the k documents with the highest BM25 score for a query.
+
+        Args:
+            query_embedding: The output of generate_bm25_query_embedding, or any object with indices and values arrays.
+            k (int, optional): The number of documents to return. Defaults to 10.
+        Returns:
+            list[tuple[int, float]]: The (doc_id, score) pairs sorted by descending score.
+        """
+        self._merge_pending()
+        query_terms = np.asarray(query_embedding.indices, dtype=np.int64)
+        query_weights = np.asarray(query_embedding.values, dtype=np.float32)
+        if not len(query_terms) or not len(self.terms) or k <= 0:
+            return []
+
+        positions = np.minimum(np.searchsorted(self.terms, query_terms), len(self.terms) - 1)
+        found = self.terms[positions] == query_terms
+        positions, query_weights = positions[found], query_weights[found]
+        upper_bounds = self.max_weights[positions] * query_weights
+        order = np.argsort(-upper_bounds, kind="stable")
+        positions, query_weights, upper_bounds = positions[order], query_weights[order], upper_bounds[order]
+
+        # remaining_bounds[i] bounds the score a document can still gain from the terms after the i-th one.
+        remaining_bounds = np.append(np.cumsum(upper_bounds[::-1])[::-1][1:], 0)
+        # Scores are only kept for the documents touched so far, sorted by internal document number, so the work per
+        # term is proportional to its postings and the touched documents instead of the whole corpus.
+        touched = np.empty(0, dtype=np.int32)
+        scores = np.empty(0, dtype=np.float64)
+        pruned = False
+        for position, query_weight, remaining_bound in zip(positions, query_weights, remaining_bounds):
+            start, end = self.offsets[position], self.offsets[position + 1]
+            docs = self.docs[start:end]
+            if not pruned:
+                # Essential term: unseen documents can still reach the top k, so the whole posting list is scanned.
+                touched, inverse = np.unique(np.concatenate([touched, docs]), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate([scores, self.weights[start:end] * query_weight]),
+                                     minlength=len(touched))
+            else:
+                # Non-essential term: only look up the postings of the current candidates.
+                matches = np.minimum(np.searchsorted(docs, touched), len(docs) - 1)
+                hit = docs[matches] == touched
+                scores[hit] += self.weights[start:end][matches[hit]] * query_weight
+
+            if len(touched) < k:
+                continue
+            threshold = np.partition(scores, len(touched) - k)[len(touched) - k]
+            if remaining_bound <= threshold:
+                pruned = True
+                keep = scores + remaining_bound >= threshold
+                touched, scores = touched[keep], scores[keep]
+
+        best, best_scores = top_k(scores, k)
+        return [(int(self.doc_ids[touched[i]]), float(score)) for i, score in zip(best, best_scores)]
+
+    def save(self, path: str) -> None:
+        """Save the index to a directory with one .npy file per array."""
+        self._merge_pending()
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        logger.info(f"Saved BM25 index with {len(self.doc_ids)} documents to '{path}'.")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "BM25Index":
+        """Load an index saved with save.
+
+        Args:
+            path (str): The directory of the index.
+            mmap (bool, optional): Memory-map the arrays instead of reading them into memory. Defaults to True.
+        Returns:
+            BM25Index: The index.
+        """
+        index = cls()
+        for name in ARRAY_NAMES:
+            setattr(index, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None))
+        return index
@@ -0,0 +1,241 @@
+"""Local flat vector store which keeps dense embeddings as contiguous arrays on disk and memory-maps them.
+
+A store is a directory with the following files:
+    meta.json        dimension, storage dtype and format version.
+    ids.bin          int64 id of every row. The number of rows is derived from its size.
+    vectors.bin      row-major (rows, dimension) array of normalized embeddings in the storage dtype.
+    scales.bin       float32 dequantization scale of every row, only for int8 storage.
+    tombstones.bin   uint8 flag of every row, 1 when the row has been deleted.
+
+The files are memory-mapped at open time (the vectors read-only), so opening is near-instant regardless of the size of
+the store and the pages are shared between all processes which open the same store. A store supports a single writer
+process; readers call refresh to pick up its changes.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+from helper_methods.similarities import normalize_embeddings, top_k
+from vector_db.embedding_models import OPENAI_EMBEDDING_DIMENSION
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+STORAGE_DTYPES = ("float32", "float16", "int8")
+DEFAULT_SEARCH_CHUNK_SIZE = 65_536
+
+META_FILE = "meta.json"
+IDS_FILE = "ids.bin"
+VECTORS_FILE = "vectors.bin"
+SCALES_FILE = "scales.bin"
+TOMBSTONES_FILE = "tombstones.bin"
+
+
+def _map(path: str, dtype, shape: tuple[int, ...], mode: str = "r") -> np.ndarray:
+    """Memory-map the first rows of a file. np.memmap cannot map empty files, so those return an empty array."""
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+
+class DenseVectorStore:
+    """Flat, memory-mapped store of dense embeddings searched brute-force by cosine similarity."""
+
+    def __init__(self, path: str, dimension: int | None = None, dtype: str | None = None):
+        """Open the store at path, creating it when it does not exist.
+
+        An existing store keeps the dimension and dtype of its meta.json.
+
+        Args:
+            path (str): The directory of the store.
+            dimension (int, optional): The embedding dimension of a new store. Defaults to None, i.e. the dimension
+                of the existing store or OPENAI_EMBEDDING_DIMENSION for a new one.
+            dtype (str, optional): The storage dtype of a new store, one of STORAGE_DTYPES. int8 stores every row
+                with a float32 scale. Defaults to None, i.e. the dtype of the existing store or "float32" for a new
+                one.
+        Raises:
+            ValueError: If the dtype is not supported or the store on disk has a different dimension or dtype than
+                the ones passed.
+        """
+        self.path = path
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if dimension is not None and dimension != meta["dimension"]:
+                raise ValueError(f"Store at '{path}' has dimension {meta['dimension']}, not {dimension}.")
+            if dtype is not None and dtype != meta["dtype"]:
+                raise ValueError(f"Store at '{path}' has dtype '{meta['dtype']}', not '{dtype}'.")
+            dimension = meta["dimension"]
+            dtype = meta["dtype"]
+        else:
+            dimension = OPENAI_EMBEDDING_DIMENSION if dimension is None else dimension
+            dtype = "float32" if dtype is None else dtype
+            if dtype not in STORAGE_DTYPES:
+                raise ValueError(f"Unsupported dtype '{dtype}'. Supported dtypes are {STORAGE_DTYPES}.")
+            os.makedirs(path, exist_ok=True)
+            for name in (IDS_FILE, VECTORS_FILE, SCALES_FILE, TOMBSTONES_FILE):
+                open(os.path.join(path, name), "ab").close()
+            with open(meta_path, "w") as f:
+                json.dump({"version": FORMAT_VERSION, "dimension": dimension, "dtype": dtype}, f)
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self._sorted_ids = None
+        self._sorted_rows = None
+        self.refresh()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def refresh(self) -> None:
+        """Re-map the files, picking up rows appended or deleted by the writer since the store was opened."""
+        self.num_rows = os.path.getsize(self._file(IDS_FILE)) // 8
+        self.ids = _map(self._file(IDS_FILE), np.int64, (self.num_rows,))
+        self.vectors = _map(self._file(VECTORS_FILE), self.dtype, (self.num_rows, self.dimension))
+        self.scales = (_map(self._file(SCALES_FILE), np.float32, (self.num_rows,))
+                       if self.dtype == np.int8 else None)
+        self.tombstones = _map(self._file(TOMBSTONES_FILE), np.uint8, (self.num_rows,), mode="r+")
+        self._sorted_ids = None
+        self._sorted_rows = None
+
+    def __len__(self) -> int:
+        """Return the number of live (not deleted) rows."""
+        return self.num_rows - int(np.count_nonzero(self.tombstones))
+
+    def _encode(self, embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+        """Convert normalized float32 embeddings into the storage dtype."""
+        if self.dtype != np.int8:
+            return embeddings.astype(self.dtype), None
+        scales = np.abs(embeddings).max(axis=1) / 127
+        np.maximum(scales, np.finfo(np.float32).tiny, out=scales)
+        codes = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _lookup_rows(self, ids: np.ndarray) -> np.ndarray:
+        """Return the live row of every id, or -1 for unknown ids. The id index is built lazily on first use."""
+        if self._sorted_ids is None:
+            live_rows = np.flatnonzero(self.tombstones == 0)
+            order = np.argsort(self.ids[live_rows], kind="stable")
+            self._sorted_rows = live_rows[order]
+            self._sorted_ids = np.asarray(self.ids[self._sorted_rows])
+        if not len(self._sorted_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+        found = self._sorted_ids[positions] == ids
+        return np.where(found, self._sorted_rows[positions], -1)
+
+    def add(self, ids, embeddings) -> None:
+        """Append embeddings to the store. Rows of ids which already exist are replaced.
+
+        Args:
+            ids: The int64 ids of the embeddings, of shape (n,).
+            embeddings: The embeddings, of shape (n, dimension).
+        Raises:
+            ValueError: If the shapes of ids and embeddings do not match the store.
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        embeddings = normalize_embeddings(embeddings).reshape(-1, self.dimension)
+        if len(ids) != len(embeddings):
+            raise ValueError(f"Got {len(ids)} ids for {len(embeddings)} embeddings.")
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("ids must be unique.")
+        if not len(ids):
+            return
+        self.delete(ids)
+
+        vectors, scales = self._encode(embeddings)
+        # Truncate any partial rows left behind by an interrupted append, then write the ids last so that a row
+        # only becomes visible once all of its data is on disk.
+        row_files = [(VECTORS_FILE, vectors, self.dimension * self.dtype.itemsize),
+                     (TOMBSTONES_FILE, np.zeros(len(ids), dtype=np.uint8), 1)]
+        if scales is not None:
+            row_files.append((SCALES_FILE, scales, 4))
+        row_files.append((IDS_FILE, ids, 8))
+        for name, data, row_size in row_files:
+            with open(self._file(name), "r+b") as f:
+                f.truncate(self.num_rows * row_size)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(data).tobytes())
+        self.refresh()
+
+    def delete(self, ids) -> int:
+        """Mark the rows of ids as deleted. Unknown ids are ignored.
+
+        Args:
+            ids: The ids to delete.
+        Returns:
+            int: The number of deleted rows.
+        """
+        rows = self._lookup_rows(np.asarray(ids, dtype=np.int64).reshape(-1))
+        rows = rows[rows >= 0]
+        if len(rows):
+            self.tombstones[rows] = 1
+            self.tombstones.flush()
+            self._sorted_ids = None
+            self._sorted_rows = None
+        return len(rows)
+
+    def get(self, id: int) -> np.ndarray | None:
+        """Return the (normalized) embedding of an id, or None if the id is not in the store."""
+        row = self._lookup_rows(np.array([id], dtype=np.int64))[0]
+        if row < 0:
+            return None
+        vector = self.vectors[row].astype(np.float32)
+        return vector * self.scales[row] if self.scales is not None else vector
+
+    def search(self, queries, k: int = 10,
+               chunk_size: int = DEFAULT_SEARCH_CHUNK_SIZE) -> list[tuple[int, float]] | list[list[tuple[int, float]]]:
+        """Return the k rows most similar to the queries by cosine similarity, skipping deleted rows.
+
+        Args:
+            queries: A query embedding of shape (dimension,) or a batch of shape (num_queries, dimension).
+            k (int, optional): The number of results per query. Defaults to 10.
+            chunk_size (int, optional): The number of rows scored at a time. Defaults to DEFAULT_SEARCH_CHUNK_SIZE.
+        Returns:
+            list[tuple[int, float]] | list[list[tuple[int, float]]]: The (id, score) pairs sorted by descending score,
+                one list per query for a batch of queries.
+        """
+        queries = normalize_embeddings(queries)
+        single_query = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, self.num_rows, chunk_size):
+            end = min(start + chunk_size, self.num_rows)
+            scores = queries @ np.asarray(self.vectors[start:end], dtype=np.float32).T
+            if self.scales is not None:
+                scores *= self.scales[start:end]
+            scores[:, self.tombstones[start:end] != 0] = -np.inf
+            chunk_rows, chunk_scores = top_k(scores, k)
+            candidate_rows = np.concatenate([best_rows, chunk_rows + start], axis=1)
+            order, best_scores = top_k(np.concatenate([best_scores, chunk_scores], axis=1), k)
+            best_rows = np.take_along_axis(candidate_rows, order, axis=1)
+
+        results = [[(int(self.ids[row]), float(score)) for row, score in zip(rows, scores) if score != -np.inf]
+                   for rows, scores in zip(best_rows, best_scores)]
+        return results[0] if single_query else results
+
+    def compact(self) -> None:
+        """Rewrite the store without its deleted rows. Readers must refresh afterwards."""
+        live_rows = np.flatnonzero(self.tombstones == 0)
+        if len(live_rows) == self.num_rows:
+            return
+        row_files = [(IDS_FILE, self.ids), (VECTORS_FILE, self.vectors),
+                     (TOMBSTONES_FILE, np.zeros(self.num_rows, dtype=np.uint8))]
+        if self.scales is not None:
+            row_files.append((SCALES_FILE, self.scales))
+        for name, data in row_files:
+            temp_path = self._file(name + ".tmp")
+            with open(temp_path, "wb") as f:
+                for start in range(0, len(live_rows), DEFAULT_SEARCH_CHUNK_SIZE):
+                    f.write(np.ascontiguousarray(data[live_rows[start:start + DEFAULT_SEARCH_CHUNK_SIZE]]).tobytes())
+        # Replace the ids last, since their size defines the number of rows.
+        for name, _ in sorted(row_files, key=lambda item: item[0] == IDS_FILE):
+            os.replace(self._file(name + ".tmp"), self._file(name))
+        logger.info(f"Compacted store at '{self.path}' from {self.num_rows} to {len(live_rows)} rows.")
+        self.refresh()
@@ -1,5 +1,20 @@
-from fastembed.sparse.bm25 import Bm25
-from fastembed.late_interaction import LateInteractionTextEmbedding
+"""Embedding model names and dimensions, and lazily loaded fastembed models.
+
+The fastembed models are only constructed on first use and are then shared within the process, so a worker which only
+needs BM25 never pays the ONNX load time and memory of ColBERT. Servers can load them up front with
+warmup_embedding_models. The models are configured with configure_embedding_models or the FASTEMBED_CACHE_DIR,
+FASTEMBED_THREADS and FASTEMBED_PROVIDERS (comma separated ONNX execution providers) environment variables.
+"""
+
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 OPENAI_EMBEDDING_MODEL = "openai_ada"
 OPENAI_EMBEDDING_DIMENSION = 1536
@@ -9,5 +24,96 @@ LATE_INTERACTION_DIMENSION = 128
 
 LEXICAL_MODEL = "bm25"
 
-BM25_EMBEDDING_MODEL = Bm25("Qdrant/bm25")
-LATE_INTERACTION_EMBEDDING_MODEL = LateInteractionTextEmbedding("colbert-ir/colbertv2.0")
+BM25_MODEL_NAME = "Qdrant/bm25"
+LATE_INTERACTION_MODEL_NAME = "colbert-ir/colbertv2.0"
+
+EMBEDDING_MODEL_SETTINGS = {
+    "cache_dir": os.environ.get("FASTEMBED_CACHE_DIR"),
+    "threads": int(os.environ["FASTEMBED_THREADS"]) if os.environ.get("FASTEMBED_THREADS") else None,
+    "providers": os.environ["FASTEMBED_PROVIDERS"].split(",") if os.environ.get("FASTEMBED_PROVIDERS") else None,
+}
+
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def configure_embedding_models(cache_dir: str | None = None,
+                               threads: int | None = None,
+                               providers: list[str] | None = None) -> None:
+    """Set the options used to load the fastembed models. Only models loaded afterwards are affected.
+
+    Args:
+        cache_dir (str, optional): Directory where fastembed downloads and caches the models.
+        threads (int, optional): Number of threads used by ONNX runtime.
+        providers (list[str], optional): ONNX runtime execution providers, e.g. ["CPUExecutionProvider"].
+    """
+    for key, value in (("cache_dir", cache_dir), ("threads", threads), ("providers", providers)):
+        if value is not None:
+            EMBEDDING_MODEL_SETTINGS[key] = value
+    loaded = list(_MODELS)
+    if loaded:
+        logger.warning(f"Embedding models {loaded} are already loaded and keep their previous settings.")
+
+
+def _load_bm25_model():
+    from fastembed.sparse.bm25 import Bm25
+    return Bm25(BM25_MODEL_NAME, cache_dir=EMBEDDING_MODEL_SETTINGS["cache_dir"])
+
+
+def _load_late_interaction_model():
+    from fastembed.late_interaction import LateInteractionTextEmbedding
+    return LateInteractionTextEmbedding(LATE_INTERACTION_MODEL_NAME,
+                                        cache_dir=EMBEDDING_MODEL_SETTINGS["cache_dir"],
+                                        threads=EMBEDDING_MODEL_SETTINGS["threads"],
+                                        providers=EMBEDDING_MODEL_SETTINGS["providers"])
+
+
+_MODEL_LOADERS = {LEXICAL_MODEL: _load_bm25_model,
+                  LATE_INTERACTION_MODEL: _load_late_interaction_model}
+
+
+def get_embedding_model(model: str):
+    """Return the fastembed model, loading it on first use.
+
+    Args:
+        model (str): LEXICAL_MODEL or LATE_INTERACTION_MODEL.
+    Raises:
+        ValueError: If the model is not supported.
+    """
+    if model not in _MODEL_LOADERS:
+        raise ValueError(f"Model '{model}' not found in _MODEL_LOADERS. Supported models are {list(_MODEL_LOADERS)}.")
+    if model not in _MODELS:
+        with _MODELS_LOCK:
+            if model not in _MODELS:
+                logger.info(f"Loading embedding model '{model}'.")
+                _MODELS[model] = _MODEL_LOADERS[model]()
+    return _MODELS[model]
+
+
+def get_bm25_embedding_model():
+    """Return the BM25 model, loading it on first use."""
+    return get_embedding_model(LEXICAL_MODEL)
+
+
+def get_late_interaction_embedding_model():
+    """Return the ColBERT model, loading it on first use."""
+    return get_embedding_model(LATE_INTERACTION_MODEL)
+
+
+def warmup_embedding_models(models: list[str] | None = None) -> None:
+    """Load the embedding models up front, e.g. at server startup.
+
+    Args:
+        models (list[str], optional): The models to load. Defaults to all models.
+    """
+    for model in models or list(_MODEL_LOADERS):
+        get_embedding_model(model)
+
+
+def __getattr__(name: str):
+    # Keep BM25_EMBEDDING_MODEL and LATE_INTERACTION_EMBEDDING_MODEL importable, loading them on first access.
+    if name == "BM25_EMBEDDING_MODEL":
+        return get_bm25_embedding_model()
+    if name == "LATE_INTERACTION_EMBEDDING_MODEL":
+        return get_late_interaction_embedding_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
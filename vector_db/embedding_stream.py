@@ -0,0 +1,67 @@
+"""Streaming of texts through fastembed models with per-item failure reporting."""
+
+from collections import deque
+from typing import Callable, Iterable, Iterator, NamedTuple
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class EmbeddingResult(NamedTuple):
+    """The embedding of the index-th input text, or the error which prevented it from being embedded."""
+    index: int
+    embedding: object | None
+    error: str | None = None
+
+
+def embed_stream(embed: Callable[[Iterable[str]], Iterator],
+                 texts: Iterable[str],
+                 embed_single: Callable[[Iterable[str]], Iterator] | None = None) -> Iterator[EmbeddingResult]:
+    """Stream texts through one embed call, isolating the inputs which fail.
+
+    Inputs which are not strings are reported without being sent to the model. If the model stream fails, the texts
+    it had already consumed are embedded one at a time with embed_single (defaults to embed) to find the failing ones,
+    and a new stream is started for the rest of the input. A stream which fails before consuming any input, e.g.
+    because the model cannot be loaded, raises its error.
+    """
+    embed_single = embed_single or embed
+    source = enumerate(texts)
+    # (index, text, error) of the inputs consumed by the model but not yet yielded, in order.
+    in_flight = deque()
+    exhausted = False
+    num_consumed = 0
+
+    def feed() -> Iterator[str]:
+        nonlocal exhausted, num_consumed
+        for index, text in source:
+            num_consumed += 1
+            if isinstance(text, str):
+                in_flight.append((index, text, None))
+                yield text
+            else:
+                # Keep the position in the stream, the placeholder embedding is discarded.
+                in_flight.append((index, "", f"Expected a string, got {type(text).__name__}"))
+                yield ""
+        exhausted = True
+
+    while not exhausted:
+        consumed_before = num_consumed
+        try:
+            for embedding in embed(feed()):
+                index, _, error = in_flight.popleft()
+                yield EmbeddingResult(index, None if error else embedding, error)
+        except Exception as e:
+            if num_consumed == consumed_before:
+                raise
+            logger.error(f"Error generating embeddings, retrying {len(in_flight)} texts one at a time: {e}")
+            while in_flight:
+                index, text, error = in_flight.popleft()
+                if error:
+                    yield EmbeddingResult(index, None, error)
+                    continue
+                try:
+                    yield EmbeddingResult(index, next(iter(embed_single([text]))))
+                except Exception as item_error:
+                    logger.error(f"Error generating embedding for text {index}: {item_error}")
+                    yield EmbeddingResult(index, None, str(item_error))
@@ -1,35 +1,72 @@
-from vector_db.embedding_models import BM25_EMBEDDING_MODEL
+from typing import Iterable, Iterator
+from vector_db.embedding_models import get_bm25_embedding_model
+from vector_db.embedding_stream import EmbeddingResult, embed_stream
 import logging
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+DEFAULT_BM25_BATCH_SIZE = 256
+
+BM25EmbeddingResult = EmbeddingResult
+
 
 def generate_bm25_embedding(text: str):
     """
     Generate a BM25 embedding for the given text
-    
+
     Args:
         text: Text to generate embedding for
     """
     try:
-        embedding = next(BM25_EMBEDDING_MODEL.passage_embed(text))
+        embedding = next(get_bm25_embedding_model().passage_embed(text))
         return embedding
     except Exception as e:
         logger.error(f"Error generating BM25 embedding: {e}")
         return None
-    
+
 def generate_bm25_query_embedding(query: str):
     """
     Generate a BM25 query embedding for the given query
-    
+
     Args:
         query: Query to generate embedding for
     """
     try:
-        embedding = next(BM25_EMBEDDING_MODEL.query_embed(query))
+        embedding = next(get_bm25_embedding_model().query_embed(query))
         return embedding
     except Exception as e:
         logger.error(f"Error generating BM25 query embedding: {e}")
         return None
-    
+
+
+def generate_bm25_embeddings(texts: Iterable[str],
+                             batch_size: int = DEFAULT_BM25_BATCH_SIZE,
+                             parallel: int | None = None) -> Iterator[BM25EmbeddingResult]:
+    """
+    Generate BM25 embeddings for many texts, streaming them through BM25_EMBEDDING_MODEL in batches
+
+    Args:
+        texts: Texts to generate embeddings for. Any iterable, it is consumed lazily.
+        batch_size: Number of texts embedded at a time. Defaults to DEFAULT_BM25_BATCH_SIZE.
+        parallel: Number of worker processes used by fastembed, 0 to use all cores, None to embed in this process.
+
+    Yields:
+        BM25EmbeddingResult: The result of every text, in input order. Failed texts carry an error instead of an embedding.
+    """
+    yield from embed_stream(
+        lambda stream: get_bm25_embedding_model().passage_embed(stream, batch_size=batch_size, parallel=parallel), texts,
+        embed_single=lambda stream: get_bm25_embedding_model().passage_embed(stream))
+
+
+def generate_bm25_query_embeddings(queries: Iterable[str]) -> Iterator[BM25EmbeddingResult]:
+    """
+    Generate BM25 query embeddings for many queries
+
+    Args:
+        queries: Queries to generate embeddings for. Any iterable, it is consumed lazily.
+
+    Yields:
+        BM25EmbeddingResult: The result of every query, in input order. Failed queries carry an error instead of an embedding.
+    """
+    yield from embed_stream(lambda stream: get_bm25_embedding_model().query_embed(stream), queries)
@@ -0,0 +1,109 @@
+import itertools
+from typing import Iterable, Iterator
+from vector_db.embedding_models import get_late_interaction_embedding_model
+from vector_db.embedding_stream import EmbeddingResult, embed_stream
+from vector_db.multi_vector_store import MultiVectorStore
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_COLBERT_BATCH_SIZE = 32
+
+
+def generate_colbert_embedding(text: str):
+    """
+    Generate a ColBERT document embedding, a (tokens, LATE_INTERACTION_DIMENSION) matrix, for the given text
+
+    Args:
+        text: Text to generate embedding for
+    """
+    try:
+        embedding = next(get_late_interaction_embedding_model().passage_embed([text]))
+        return embedding
+    except Exception as e:
+        logger.error(f"Error generating ColBERT embedding: {e}")
+        return None
+
+def generate_colbert_query_embedding(query: str):
+    """
+    Generate a ColBERT query embedding, a (query tokens, LATE_INTERACTION_DIMENSION) matrix, for the given query
+
+    Args:
+        query: Query to generate embedding for
+    """
+    try:
+        embedding = next(get_late_interaction_embedding_model().query_embed(query))
+        return embedding
+    except Exception as e:
+        logger.error(f"Error generating ColBERT query embedding: {e}")
+        return None
+
+
+def generate_colbert_embeddings(texts: Iterable[str],
+                                batch_size: int = DEFAULT_COLBERT_BATCH_SIZE,
+                                parallel: int | None = None) -> Iterator[EmbeddingResult]:
+    """
+    Generate ColBERT document embeddings for many texts, streaming them through the model in batches
+
+    Args:
+        texts: Texts to generate embeddings for. Any iterable, it is consumed lazily.
+        batch_size: Number of texts embedded at a time. Defaults to DEFAULT_COLBERT_BATCH_SIZE.
+        parallel: Number of worker processes used by fastembed, 0 to use all cores, None to embed in this process.
+
+    Yields:
+        EmbeddingResult: The result of every text, in input order. Failed texts carry an error instead of an embedding.
+    """
+    yield from embed_stream(
+        lambda stream: get_late_interaction_embedding_model().passage_embed(stream, batch_size=batch_size,
+                                                                            parallel=parallel), texts,
+        embed_single=lambda stream: get_late_interaction_embedding_model().passage_embed(stream))
+
+
+def generate_colbert_query_embeddings(queries: Iterable[str],
+                                      batch_size: int = DEFAULT_COLBERT_BATCH_SIZE) -> Iterator[EmbeddingResult]:
+    """
+    Generate ColBERT query embeddings for many queries
+
+    Args:
+        queries: Queries to generate embeddings for. Any iterable, it is consumed lazily.
+        batch_size: Number of queries embedded at a time. Defaults to DEFAULT_COLBERT_BATCH_SIZE.
+
+    Yields:
+        EmbeddingResult: The result of every query, in input order. Failed queries carry an error instead of an embedding.
+    """
+    yield from embed_stream(
+        lambda stream: get_late_interaction_embedding_model().query_embed(stream, batch_size=batch_size), queries)
+
+
+def add_colbert_embeddings_to_store(store: MultiVectorStore,
+                                    doc_ids: Iterable[int],
+                                    texts: Iterable[str],
+                                    batch_size: int = DEFAULT_COLBERT_BATCH_SIZE,
+                                    parallel: int | None = None) -> list[int]:
+    """
+    Encode documents with ColBERT and append their token matrices to a MultiVectorStore
+
+    Args:
+        store: The store to append to.
+        doc_ids: The ids of the documents, in the same order as texts.
+        texts: The texts of the documents. Any iterable, it is consumed lazily.
+        batch_size: Number of texts embedded at a time. Defaults to DEFAULT_COLBERT_BATCH_SIZE.
+        parallel: Number of worker processes used by fastembed, 0 to use all cores, None to embed in this process.
+
+    Returns:
+        list[int]: The ids of the documents which could not be embedded.
+    """
+    failed_ids = []
+
+    def embedded_documents():
+        for doc_id, result in zip(doc_ids, generate_colbert_embeddings(texts, batch_size=batch_size,
+                                                                       parallel=parallel)):
+            if result.error:
+                failed_ids.append(doc_id)
+                continue
+            yield doc_id, result.embedding
+
+    ids_stream, matrices_stream = itertools.tee(embedded_documents())
+    store.add_many((doc_id for doc_id, _ in ids_stream), (matrix for _, matrix in matrices_stream))
+    return failed_ids
@@ -0,0 +1,240 @@
+"""Staged hybrid retrieval: BM25 and dense candidate generation, fusion, pruning and optional reranking.
+
+    1. BM25 (LEXICAL_MODEL) and dense (OPENAI_EMBEDDING_MODEL) candidates are generated concurrently.
+    2. The candidate lists are fused with reciprocal rank fusion or a weighted sum of min-max normalized scores.
+    3. The fused list is pruned to num_fused candidates.
+    4. The pruned candidates are optionally reranked with ColBERT MaxSim (LATE_INTERACTION_MODEL) or a Together
+       rerank model.
+
+Every stage reports its latency and candidate count, so the latency/recall trade-off can be tuned.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from vector_db.bm25_index import BM25Index
+from vector_db.dense_vector_store import DenseVectorStore
+from vector_db.embedding_models import LATE_INTERACTION_MODEL, LEXICAL_MODEL, OPENAI_EMBEDDING_MODEL
+from vector_db.generate_bm25_embedding import generate_bm25_query_embedding
+from vector_db.generate_colbert_embedding import generate_colbert_query_embedding
+from vector_db.late_interaction_scoring import rerank_with_maxsim
+from vector_db.multi_vector_store import MultiVectorStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fusion methods.
+RECIPROCAL_RANK_FUSION = "reciprocal_rank_fusion"
+WEIGHTED_SCORE_FUSION = "weighted_score_fusion"
+FUSION_METHODS = (RECIPROCAL_RANK_FUSION, WEIGHTED_SCORE_FUSION)
+
+# Rerankers, besides LATE_INTERACTION_MODEL.
+TOGETHER_RERANKER = "together_rerank"
+DEFAULT_TOGETHER_RERANK_MODEL = "Llama-Rank-V1"
+
+FUSION_STAGE = "fusion"
+DEFAULT_RRF_K = 60
+DEFAULT_CANDIDATES_PER_RETRIEVER = 100
+DEFAULT_NUM_FUSED = 50
+
+
+class StageStats(NamedTuple):
+    """Latency and number of output candidates of a retrieval stage."""
+    name: str
+    latency_ms: float
+    num_candidates: int
+
+
+class RetrievalResult(NamedTuple):
+    """The (doc_id, score) results of a query together with the statistics of every stage."""
+    results: list[tuple[int, float]]
+    stages: list[StageStats]
+    latency_ms: float
+
+
+def reciprocal_rank_fusion(rankings: dict[str, list[tuple[int, float]]],
+                           weights: dict[str, float] | None = None,
+                           rrf_k: int = DEFAULT_RRF_K) -> list[tuple[int, float]]:
+    """Fuse ranked lists by summing weight / (rrf_k + rank) over the lists which contain a document.
+
+    Args:
+        rankings (dict[str, list[tuple[int, float]]]): The (doc_id, score) list of every retriever, best first.
+        weights (dict[str, float], optional): The weight of every retriever. Defaults to 1 for all.
+        rrf_k (int, optional): The rank offset, which dampens the influence of the top ranks. Defaults to DEFAULT_RRF_K.
+    Returns:
+        list[tuple[int, float]]: The fused (doc_id, score) list sorted by descending score.
+    """
+    fused = {}
+    for name, ranking in rankings.items():
+        weight = (weights or {}).get(name, 1.0)
+        for rank, (doc_id, _) in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def weighted_score_fusion(rankings: dict[str, list[tuple[int, float]]],
+                          weights: dict[str, float] | None = None) -> list[tuple[int, float]]:
+    """Fuse ranked lists by summing the weighted, min-max normalized scores of every document.
+
+    Args:
+        rankings (dict[str, list[tuple[int, float]]]): The (doc_id, score) list of every retriever, best first.
+        weights (dict[str, float], optional): The weight of every retriever. Defaults to 1 for all.
+    Returns:
+        list[tuple[int, float]]: The fused (doc_id, score) list sorted by descending score.
+    """
+    fused = {}
+    for name, ranking in rankings.items():
+        if not ranking:
+            continue
+        weight = (weights or {}).get(name, 1.0)
+        scores = np.array([score for _, score in ranking], dtype=np.float64)
+        low, high = scores.min(), scores.max()
+        normalized = (scores - low) / (high - low) if high > low else np.ones_like(scores)
+        for (doc_id, _), score in zip(ranking, normalized):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * float(score)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def _default_embed_query(query: str):
+    from llm_methods.openai_llms import get_openai_embedding
+    return get_openai_embedding(query)
+
+
+class HybridRetriever:
+    """Retrieval pipeline fusing BM25 and dense candidates, with optional late interaction or Together reranking."""
+
+    def __init__(self,
+                 bm25_index: BM25Index | None = None,
+                 dense_store: DenseVectorStore | None = None,
+                 multi_vector_store: MultiVectorStore | None = None,
+                 embed_query: Callable[[str], list[float]] | None = None,
+                 get_texts: Callable[[list[int]], list[str]] | None = None,
+                 fusion: str = RECIPROCAL_RANK_FUSION,
+                 weights: dict[str, float] | None = None,
+                 rrf_k: int = DEFAULT_RRF_K,
+                 candidates_per_retriever: int = DEFAULT_CANDIDATES_PER_RETRIEVER,
+                 num_fused: int = DEFAULT_NUM_FUSED,
+                 reranker: str | None = None,
+                 together_rerank_model: str = DEFAULT_TOGETHER_RERANK_MODEL):
+        """
+        Args:
+            bm25_index (BM25Index, optional): The lexical index. Skipped when None.
+            dense_store (DenseVectorStore, optional): The dense index. Skipped when None.
+            multi_vector_store (MultiVectorStore, optional): The ColBERT token store, required by the
+                LATE_INTERACTION_MODEL reranker.
+            embed_query (Callable, optional): Returns the dense embedding of a query. Defaults to get_openai_embedding.
+            get_texts (Callable, optional): Returns the texts of document ids, required by the TOGETHER_RERANKER.
+            fusion (str, optional): One of FUSION_METHODS. Defaults to RECIPROCAL_RANK_FUSION.
+            weights (dict[str, float], optional): Weight of LEXICAL_MODEL and OPENAI_EMBEDDING_MODEL in the fusion.
+            rrf_k (int, optional): The rank offset of reciprocal rank fusion. Defaults to DEFAULT_RRF_K.
+            candidates_per_retriever (int, optional): The number of candidates generated by every retriever.
+            num_fused (int, optional): The number of fused candidates kept for reranking.
+            reranker (str, optional): LATE_INTERACTION_MODEL, TOGETHER_RERANKER or None. Defaults to None.
+            together_rerank_model (str, optional): The model of the TOGETHER_RERANKER.
+        Raises:
+            ValueError: If the configuration is inconsistent.
+        """
+        if bm25_index is None and dense_store is None:
+            raise ValueError("At least one of bm25_index and dense_store is required.")
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method '{fusion}'. Supported methods are {FUSION_METHODS}.")
+        if reranker == LATE_INTERACTION_MODEL and multi_vector_store is None:
+            raise ValueError("The late interaction reranker requires a multi_vector_store.")
+        if reranker == TOGETHER_RERANKER and get_texts is None:
+            raise ValueError("The Together reranker requires get_texts.")
+        if reranker not in (None, LATE_INTERACTION_MODEL, TOGETHER_RERANKER):
+            raise ValueError(f"Unknown reranker '{reranker}'.")
+        self.bm25_index = bm25_index
+        self.dense_store = dense_store
+        self.multi_vector_store = multi_vector_store
+        self.embed_query = embed_query or _default_embed_query
+        self.get_texts = get_texts
+        self.fusion = fusion
+        self.weights = weights
+        self.rrf_k = rrf_k
+        self.candidates_per_retriever = candidates_per_retriever
+        self.num_fused = num_fused
+        self.reranker = reranker
+        self.together_rerank_model = together_rerank_model
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-retrieval")
+
+    def _timed(self, name: str, function: Callable[[], list[tuple[int, float]]]) -> tuple[list, StageStats]:
+        start = time.perf_counter()
+        results = function()
+        return results, StageStats(name, (time.perf_counter() - start) * 1000, len(results))
+
+    def _search_bm25(self, query: str) -> list[tuple[int, float]]:
+        query_embedding = generate_bm25_query_embedding(query)
+        if query_embedding is None:
+            return []
+        return self.bm25_index.search(query_embedding, k=self.candidates_per_retriever)
+
+    def _search_dense(self, query: str) -> list[tuple[int, float]]:
+        return self.dense_store.search(self.embed_query(query), k=self.candidates_per_retriever)
+
+    def _rerank_late_interaction(self, query: str, candidates: list[tuple[int, float]], k: int):
+        query_embedding = generate_colbert_query_embedding(query)
+        if query_embedding is None:
+            logger.warning("Could not embed the query with ColBERT, keeping the fused order.")
+            return candidates[:k]
+        return rerank_with_maxsim(query_embedding, self.multi_vector_store, [doc_id for doc_id, _ in candidates], k=k)
+
+    def _rerank_together(self, query: str, candidates: list[tuple[int, float]], k: int):
+        from llm_methods.together_llms import get_rerank_from_together_models
+        doc_ids = [doc_id for doc_id, _ in candidates]
+        results = get_rerank_from_together_models(self.together_rerank_model, query, self.get_texts(doc_ids), top_n=k)
+        return [(doc_ids[result.index], result.relevance_score) for result in results]
+
+    def retrieve(self, query: str, k: int = 10) -> RetrievalResult:
+        """Retrieve the k best documents for a query.
+
+        Args:
+            query (str): The query.
+            k (int, optional): The number of documents to return. Defaults to 10.
+        Returns:
+            RetrievalResult: The (doc_id, score) results and the statistics of every stage.
+        """
+        start = time.perf_counter()
+        futures = {}
+        if self.bm25_index is not None:
+            futures[LEXICAL_MODEL] = self._executor.submit(self._timed, LEXICAL_MODEL,
+                                                           lambda: self._search_bm25(query))
+        if self.dense_store is not None:
+            futures[OPENAI_EMBEDDING_MODEL] = self._executor.submit(self._timed, OPENAI_EMBEDDING_MODEL,
+                                                                    lambda: self._search_dense(query))
+        rankings, stages = {}, []
+        for name, future in futures.items():
+            rankings[name], stats = future.result()
+            stages.append(stats)
+
+        def fuse():
+            if self.fusion == RECIPROCAL_RANK_FUSION:
+                fused = reciprocal_rank_fusion(rankings, self.weights, self.rrf_k)
+            else:
+                fused = weighted_score_fusion(rankings, self.weights)
+            return fused[:self.num_fused]
+
+        candidates, stats = self._timed(FUSION_STAGE, fuse)
+        stages.append(stats)
+
+        if self.reranker == LATE_INTERACTION_MODEL:
+            results, stats = self._timed(LATE_INTERACTION_MODEL,
+                                         lambda: self._rerank_late_interaction(query, candidates, k))
+            stages.append(stats)
+        elif self.reranker == TOGETHER_RERANKER and candidates:
+            results, stats = self._timed(TOGETHER_RERANKER, lambda: self._rerank_together(query, candidates, k))
+            stages.append(stats)
+        else:
+            results = candidates[:k]
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        logger.debug(f"Retrieved {len(results)} documents in {latency_ms:.1f} ms: {stages}")
+        return RetrievalResult(results, stages, latency_ms)
+
+    def close(self) -> None:
+        """Shut down the worker threads."""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,94 @@
+"""Late interaction (ColBERT MaxSim) scoring of candidate documents stored in a MultiVectorStore.
+
+The MaxSim score of a document is the sum over the query tokens of the highest similarity between that query token and
+any token of the document. The token rows of a block of candidates are gathered from the flat token store and scored
+with one matrix product, and the per-document maxima are taken with np.maximum.reduceat over the document segments.
+"""
+
+import logging
+
+import numpy as np
+
+from helper_methods.similarities import top_k
+from vector_db.multi_vector_store import MultiVectorStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of candidate documents scored with one matrix product.
+DEFAULT_MAXSIM_BLOCK_SIZE = 256
+
+
+def maxsim_scores(query: np.ndarray, store: MultiVectorStore, rows: np.ndarray) -> np.ndarray:
+    """Compute the MaxSim score of the documents in the given rows of the store.
+
+    Args:
+        query (np.ndarray): The (query tokens, dimension) query matrix.
+        store (MultiVectorStore): The store holding the document token matrices.
+        rows (np.ndarray): The rows of the documents to score.
+    Returns:
+        np.ndarray: The float32 score of every document. Documents without tokens score 0.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    rows = np.asarray(rows, dtype=np.int64)
+    scores = np.zeros(len(rows), dtype=np.float32)
+    starts = store.offsets[rows]
+    lengths = store.offsets[rows + 1] - starts
+    non_empty = lengths > 0
+    if not non_empty.any():
+        return scores
+    starts, lengths = starts[non_empty], lengths[non_empty]
+
+    # Token rows of all documents, concatenated: for each document, starts[i] + 0..lengths[i] - 1.
+    segment_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    token_rows = np.arange(int(lengths.sum())) - np.repeat(segment_starts - starts, lengths)
+    tokens = store.vectors[token_rows].astype(np.float32)
+    # (query tokens, document tokens) layout, so that reduceat runs along contiguous rows.
+    similarities = np.ascontiguousarray((tokens @ query.T).T)
+    scores[non_empty] = np.maximum.reduceat(similarities, segment_starts, axis=1).sum(axis=0)
+    return scores
+
+
+def rerank_with_maxsim(query: np.ndarray,
+                       store: MultiVectorStore,
+                       candidate_ids,
+                       k: int = 10,
+                       max_candidates: int | None = None,
+                       block_size: int = DEFAULT_MAXSIM_BLOCK_SIZE,
+                       early_stop_blocks: int | None = None) -> list[tuple[int, float]]:
+    """Rerank candidate documents by their MaxSim score against a query.
+
+    Candidates are scored in blocks in the given order, which should be the order of the previous retrieval stage.
+
+    Args:
+        query (np.ndarray): The (query tokens, dimension) query matrix, e.g. from generate_colbert_query_embedding.
+        store (MultiVectorStore): The store holding the document token matrices.
+        candidate_ids: The ids of the candidate documents. Ids missing from the store are skipped.
+        k (int, optional): The number of documents to return. Defaults to 10.
+        max_candidates (int, optional): Only score the first max_candidates candidates. Defaults to None, scoring all.
+        block_size (int, optional): The number of candidates scored at a time. Defaults to DEFAULT_MAXSIM_BLOCK_SIZE.
+        early_stop_blocks (int, optional): Stop once the top k has not changed for this many consecutive blocks.
+            Defaults to None, scoring all candidates.
+    Returns:
+        list[tuple[int, float]]: The (doc_id, score) pairs sorted by descending score.
+    """
+    candidate_ids = np.asarray(candidate_ids, dtype=np.int64)[:max_candidates]
+    rows = store.rows_for_ids(candidate_ids)
+    found = rows >= 0
+    if not found.all():
+        logger.warning(f"{int((~found).sum())} candidates are missing from the multi-vector store.")
+    candidate_ids, rows = candidate_ids[found], rows[found]
+
+    best_ids = np.empty(0, dtype=np.int64)
+    best_scores = np.empty(0, dtype=np.float32)
+    unchanged_blocks = 0
+    for start in range(0, len(rows), block_size):
+        block_scores = maxsim_scores(query, store, rows[start:start + block_size])
+        candidate_block = np.concatenate([best_ids, candidate_ids[start:start + block_size]])
+        order, scores = top_k(np.concatenate([best_scores, block_scores]), k)
+        new_best_ids = candidate_block[order]
+        unchanged_blocks = unchanged_blocks + 1 if np.array_equal(new_best_ids, best_ids) else 0
+        best_ids, best_scores = new_best_ids, scores
+        if early_stop_blocks is not None and unchanged_blocks >= early_stop_blocks:
+            break
+    return [(int(doc_id), float(score)) for doc_id, score in zip(best_ids, best_scores)]
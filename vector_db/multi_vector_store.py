@@ -0,0 +1,150 @@
+"""Compact on-disk store of multi-vector (ColBERT) document embeddings.
+
+The token vectors of all documents are kept in one contiguous float16 array instead of a list of per-document arrays.
+A store is a directory with the following files:
+    meta.json     dimension and format version.
+    ids.bin       int64 id of every document. The number of documents is derived from its size.
+    offsets.bin   int64 offsets into the token rows, starting with 0; document i owns rows offsets[i]:offsets[i + 1].
+    vectors.bin   row-major (tokens, dimension) float16 array of token vectors.
+
+The files are memory-mapped at open time, so opening is near-instant and the pages are shared between processes.
+A store supports a single writer process; readers call refresh to pick up its changes.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+from vector_db.embedding_models import LATE_INTERACTION_DIMENSION
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+VECTOR_DTYPE = np.float16
+# Number of token vectors buffered in memory by add_many before they are appended to disk.
+DEFAULT_FLUSH_SIZE_IN_TOKENS = 1_000_000
+
+META_FILE = "meta.json"
+IDS_FILE = "ids.bin"
+OFFSETS_FILE = "offsets.bin"
+VECTORS_FILE = "vectors.bin"
+
+
+def _map(path: str, dtype, shape: tuple[int, ...]) -> np.ndarray:
+    """Memory-map the first rows of a file. np.memmap cannot map empty files, so those return an empty array."""
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class MultiVectorStore:
+    """Append-only store of per-document token matrices in one contiguous float16 array with an offsets index."""
+
+    def __init__(self, path: str, dimension: int = LATE_INTERACTION_DIMENSION, in_memory: bool = False):
+        """Open the store at path, creating it when it does not exist.
+
+        Args:
+            path (str): The directory of the store.
+            dimension (int, optional): The token vector dimension. Defaults to LATE_INTERACTION_DIMENSION.
+            in_memory (bool, optional): Read the arrays into memory instead of memory-mapping them. Defaults to False.
+        Raises:
+            ValueError: If the store on disk has a different dimension.
+        """
+        self.path = path
+        self.dimension = dimension
+        self.in_memory = in_memory
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["dimension"] != dimension:
+                raise ValueError(f"Store at '{path}' has dimension {meta['dimension']}, not {dimension}.")
+        else:
+            os.makedirs(path, exist_ok=True)
+            open(os.path.join(path, IDS_FILE), "ab").close()
+            open(os.path.join(path, VECTORS_FILE), "ab").close()
+            with open(os.path.join(path, OFFSETS_FILE), "wb") as f:
+                f.write(np.zeros(1, dtype=np.int64).tobytes())
+            with open(meta_path, "w") as f:
+                json.dump({"version": FORMAT_VERSION, "dimension": dimension}, f)
+        self.refresh()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def refresh(self) -> None:
+        """Re-map the files, picking up documents appended by the writer since the store was opened."""
+        self.num_documents = os.path.getsize(self._file(IDS_FILE)) // 8
+        self.ids = _map(self._file(IDS_FILE), np.int64, (self.num_documents,))
+        self.offsets = _map(self._file(OFFSETS_FILE), np.int64, (self.num_documents + 1,))
+        self.num_tokens = int(self.offsets[-1])
+        self.vectors = _map(self._file(VECTORS_FILE), VECTOR_DTYPE, (self.num_tokens, self.dimension))
+        if self.in_memory:
+            self.ids, self.offsets, self.vectors = np.array(self.ids), np.array(self.offsets), np.array(self.vectors)
+        self._rows_by_id = None
+
+    def __len__(self) -> int:
+        return self.num_documents
+
+    def document_lengths(self) -> np.ndarray:
+        """Return the number of token vectors of every document."""
+        return np.diff(self.offsets)
+
+    def get(self, row: int) -> np.ndarray:
+        """Return the (tokens, dimension) float16 matrix of the document in the given row, as a view into the store."""
+        return self.vectors[self.offsets[row]:self.offsets[row + 1]]
+
+    def rows_for_ids(self, ids) -> np.ndarray:
+        """Return the row of every document id, or -1 for unknown ids."""
+        if self._rows_by_id is None:
+            self._rows_by_id = {int(doc_id): row for row, doc_id in enumerate(self.ids)}
+        return np.array([self._rows_by_id.get(int(doc_id), -1) for doc_id in ids], dtype=np.int64)
+
+    def add_many(self, ids, matrices, flush_size_in_tokens: int = DEFAULT_FLUSH_SIZE_IN_TOKENS) -> None:
+        """Append the token matrices of many documents. The matrices are consumed lazily and written in chunks.
+
+        Args:
+            ids: The int64 ids of the documents.
+            matrices: The (tokens, dimension) token matrix of every document. Any iterable.
+            flush_size_in_tokens (int, optional): Number of token vectors buffered before they are written.
+                Defaults to DEFAULT_FLUSH_SIZE_IN_TOKENS.
+        Raises:
+            ValueError: If a matrix does not have the dimension of the store.
+        """
+        buffered_ids, buffered_matrices, buffered_tokens = [], [], 0
+        for doc_id, matrix in zip(ids, matrices):
+            matrix = np.asarray(matrix, dtype=VECTOR_DTYPE)
+            if matrix.ndim != 2 or matrix.shape[1] != self.dimension:
+                raise ValueError(f"Expected a (tokens, {self.dimension}) matrix for document {doc_id}, "
+                                 f"got shape {matrix.shape}.")
+            buffered_ids.append(doc_id)
+            buffered_matrices.append(matrix)
+            buffered_tokens += len(matrix)
+            if buffered_tokens >= flush_size_in_tokens:
+                self._append(buffered_ids, buffered_matrices)
+                buffered_ids, buffered_matrices, buffered_tokens = [], [], 0
+        if buffered_ids:
+            self._append(buffered_ids, buffered_matrices)
+
+    def add(self, doc_id: int, matrix) -> None:
+        """Append the token matrix of one document."""
+        self.add_many([doc_id], [matrix])
+
+    def _append(self, ids: list[int], matrices: list[np.ndarray]) -> None:
+        lengths = np.array([len(matrix) for matrix in matrices], dtype=np.int64)
+        ends = self.num_tokens + np.cumsum(lengths)
+        # Truncate any partial data left behind by an interrupted append, then write the ids last so that a document
+        # only becomes visible once all of its data is on disk.
+        row_size = self.dimension * np.dtype(VECTOR_DTYPE).itemsize
+        row_files = [(VECTORS_FILE, np.concatenate(matrices), self.num_tokens * row_size),
+                     (OFFSETS_FILE, ends, (self.num_documents + 1) * 8),
+                     (IDS_FILE, np.asarray(ids, dtype=np.int64), self.num_documents * 8)]
+        for name, data, size in row_files:
+            with open(self._file(name), "r+b") as f:
+                f.truncate(size)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(data).tobytes())
+        self.refresh()